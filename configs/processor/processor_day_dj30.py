@@ -1,7 +1,7 @@
 root = None
 workdir = "workdir"
 tag = "processd_day_dj30"
-batch_size = 5
+workers = None
 
 processor = dict(
     type = "Processor",
@@ -1,7 +1,7 @@
 root = None
 workdir = "workdir"
 tag = "processd_day_exp_cryptos"
-batch_size = 1
+workers = None
 
 processor = dict(
     type = "Processor",
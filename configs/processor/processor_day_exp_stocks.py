@@ -1,7 +1,7 @@
 root = None
 workdir = "workdir"
 tag = "processd_day_exp_stocks"
-batch_size = 5
+workers = None
 
 processor = dict(
     type = "Processor",
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+def asof_join(calendar, df, columns = None, tolerance = None, date_column = None):
+    """
+    For every timestamp of the sorted calendar take the last row of df whose timestamp is not
+    after it (pd.merge_asof with direction="backward"), i.e. the value known on that day.
+    Returns a frame with one row per calendar timestamp and the given columns (all but the
+    timestamp by default), nan before the first row of df or when the last row is older than
+    tolerance. date_column adds the timestamp of the matched row under that name.
+    """
+    columns = columns if columns is not None else [column for column in df.columns if column != "timestamp"]
+
+    left = pd.DataFrame({"timestamp": pd.DatetimeIndex(calendar).values})
+    right = df[["timestamp"] + list(columns)].copy()
+    right["timestamp"] = pd.to_datetime(right["timestamp"]).astype(left["timestamp"].dtype)
+    right = right.sort_values(by="timestamp", kind="stable")
+    if date_column is not None:
+        right[date_column] = right["timestamp"]
+
+    merged = pd.merge_asof(left, right, on="timestamp", direction="backward", tolerance=tolerance)
+    return merged.drop(columns=["timestamp"])
+
+def asof_positions(calendar, timestamps):
+    """Number of (sorted) timestamps on or before each calendar timestamp, one past the as-of row."""
+    timestamps = pd.DatetimeIndex(timestamps).values
+    return np.searchsorted(timestamps, pd.DatetimeIndex(calendar).values.astype(timestamps.dtype), side="right")
+
+def align_asset(prices_df,
+                economics_df = None,
+                sentiments_df = None,
+                guidances_df = None,
+                news_df = None):
+    """
+    Align the sparse sources of an asset onto its trading calendar (the price timestamps) once.
+    One row per trading day, indexed by timestamp:
+        price_row: row of the day in prices_df
+        economic columns + economic_date: indicators as known on the day and their release date
+        sentiment columns + sentiment_date: latest sentiment on or before the day
+        {news, guidance, sentiment}_end: number of rows on or before the day, so the rows of a
+            date window are source_df.iloc[start_end:stop_end] and the latest one is end - 1
+    """
+    calendar = pd.DatetimeIndex(prices_df["timestamp"].values, name="timestamp")
+
+    aligned = pd.DataFrame({"price_row": np.arange(len(calendar))}, index=calendar)
+
+    if economics_df is not None:
+        columns = [column for column in economics_df.columns if column not in ["timestamp", "type"]]
+        economic = asof_join(calendar, economics_df, columns, date_column="economic_date")
+        for column in economic.columns:
+            aligned[column] = economic[column].values
+
+    if sentiments_df is not None:
+        sentiment = asof_join(calendar, sentiments_df, date_column="sentiment_date")
+        for column in sentiment.columns:
+            aligned[column] = sentiment[column].values
+
+    for name, df in [("news", news_df), ("guidance", guidances_df), ("sentiment", sentiments_df)]:
+        if df is not None:
+            aligned["{}_end".format(name)] = asof_positions(calendar, df["timestamp"].values)
+
+    return aligned
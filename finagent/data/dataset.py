@@ -1,7 +1,18 @@
 import os
+import json
+import hashlib
 from finagent.data import BaseDataset
 from finagent.registry import DATASET
+from finagent.utils import normalize_dates
+from finagent.data.align import align_asset
+from finagent.data.lazy import LazyAssetDict
+from finagent.data.partitioned import read_partitioned, partition_path
+from finagent.data.snapshot import SnapshotCache, fingerprint, source_version
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 pd.set_option('display.max_columns', 100000)
 pd.set_option('display.max_rows', 100000)
@@ -19,6 +30,15 @@ class Dataset(BaseDataset):
                  interval: str = "day",
                  workdir: str = None,
                  tag: str = None,
+                 lazy: bool = True,
+                 cache_size: int = None,
+                 partitioned_path: str = None,
+                 start_date: str = None,
+                 end_date: str = None,
+                 look_back_days: int = 0,
+                 look_forward_days: int = 0,
+                 snapshot_path: str = None,
+                 compact: bool = True,
                  ):
         super(Dataset, self).__init__()
 
@@ -44,146 +64,318 @@ class Dataset(BaseDataset):
         self.interval = interval
         self.workdir = workdir
         self.tag = tag
+        # lazy: load an asset's tables on first access; cache_size: at most that many assets stay loaded
+        self.lazy = lazy
+        self.cache_size = cache_size
+        # partitioned_path: hive-partitioned dataset written by Processor(save_partitioned=True), only
+        # the rows inside the [start_date, end_date] window (plus look back/forward) are read.
+        # News ids are then numbered over the rows inside the window.
+        self.partitioned_path = os.path.join(root, partitioned_path) if partitioned_path is not None else None
+        self.start_date = start_date
+        self.end_date = end_date
+        self.look_back_days = look_back_days
+        self.look_forward_days = look_forward_days
+        # compact: integer news ids (formatted when rendered into the prompts), categorical type/source
+        # and Arrow-backed title/text columns instead of Python objects
+        self.compact = compact
 
         self.exp_path = os.path.join(self.root, self.workdir, self.tag)
         os.makedirs(self.exp_path, exist_ok=True)
 
+        # snapshot_path: Arrow IPC snapshots of the normalized tables, keyed by this config and the
+        # input files, a later run with the same inputs memory-maps them instead of normalizing again
+        self.snapshot = None
+        if snapshot_path is not None:
+            # the window only changes the rows read from the partitioned dataset
+            start, end = self._window() if self.partitioned_path is not None else (None, None)
+            self.snapshot = SnapshotCache(os.path.join(root, snapshot_path),
+                                          config=dict(interval=self.interval,
+                                                      partitioned=self.partitioned_path is not None,
+                                                      compact=self.compact,
+                                                      start=start,
+                                                      end=end))
+
         self.assets = self._init_assets()
         self.prices = self._load_prices()
         self.news = self._load_news()
         self.guidances = self._load_guidances()
         self.sentiments = self._load_sentiments()
         self.economics = self._load_economics()
+        self.aligned = self._align()
 
     def _init_assets(self):
         with open(self.assets_path) as op:
             assets = [line.strip() for line in op.readlines()]
         return assets
 
-    def _load_prices(self):
+    def _window(self):
+        """
+        Date window of the rows to read from the partitioned dataset, start_date - look_back_days
+        to end_date + look_forward_days. The look back/forward are trading days in the environment,
+        they are converted to calendar days with a 2x margin for weekends and holidays.
+        """
+        start, end = None, None
+        if self.start_date is not None:
+            start = pd.Timestamp(self.start_date) - pd.Timedelta(days=2 * self.look_back_days + 7)
+        if self.end_date is not None:
+            end = pd.Timestamp(self.end_date) + pd.Timedelta(days=2 * self.look_forward_days + 7)
+        return start, end
+
+    def _read_source(self, source, path, asset, as_table = False):
+        """An asset's processed table: its {asset}.parquet, or its rows inside the window of the partitioned dataset."""
+        if self.partitioned_path is not None:
+            start, end = self._window()
+            return read_partitioned(self.partitioned_path, source, asset, start_date=start, end_date=end, as_table=as_table)
+        path = os.path.join(path, "{}.parquet".format(asset))
+        return pq.read_table(path) if as_table else pd.read_parquet(path)
+
+    def _required_columns(self, columns):
+        """Columns a news or guidance row is dropped for when missing, the url content is optional."""
+        return [column for column in columns if column != "content"]
+
+    def _source_inputs(self, source, path, asset):
+        if self.partitioned_path is not None:
+            return [partition_path(self.partitioned_path, source, asset)]
+        return [os.path.join(path, "{}.parquet".format(asset))]
+
+    def _cached(self, source, path, asset, loader):
+        """loader(asset) through the snapshot cache when enabled."""
+        if self.snapshot is None:
+            return loader(asset)
+        return self.snapshot.cached(source, asset, self._source_inputs(source, path, asset), loader)
+
+    def _compact(self, df, categories = (), strings = ()):
+        """
+        Categorical categories columns and Arrow string strings columns when compact. Applied again
+        to frames read from a snapshot, which come back with pd.StringDtype("pyarrow") columns.
+        """
+        if not self.compact:
+            return df
+        dtypes = {column: "category" for column in categories}
+        dtypes.update({column: pd.ArrowDtype(pa.string()) for column in strings})
+        return df.astype(dtypes)
+
+    def _asset_mapping(self, loader):
+        """{asset: frame}, loaded on first access when lazy, otherwise right away."""
+        if self.lazy:
+            return LazyAssetDict(self.assets, loader, capacity=self.cache_size)
+        return {asset: loader(asset) for asset in self.assets}
 
-        prices = {}
+    def _load_prices(self):
+        return self._asset_mapping(self._load_price)
 
-        for asset in self.assets:
-            path = os.path.join(self.price_path, "{}.parquet".format(asset))
-            df = pd.read_parquet(path)
+    def _load_price(self, asset):
+        return self._cached("price", self.price_path, asset, self._normalize_price)
 
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df["timestamp"] = df["timestamp"].apply(lambda x: x.strftime("%Y-%m-%d"))
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
+    def _normalize_price(self, asset):
+        df = self._read_source("price", self.price_path, asset)
 
-            df = df.sort_values(by="timestamp")
-            df = df.reset_index(drop=True)
+        df["timestamp"] = normalize_dates(df["timestamp"])
 
-            df = df[["timestamp", "open", "high", "low", "close", "adj_close", "volume"]]
+        df = df.sort_values(by="timestamp", kind="stable")
+        df = df.reset_index(drop=True)
 
-            prices[asset] = df
+        df = df[["timestamp", "open", "high", "low", "close", "adj_close", "volume"]]
 
-        return prices
+        return df
 
     def _load_news(self):
+        self.news_counts = {}
+        self.news_offsets = None
+        return self._asset_mapping(self._load_asset_news)
+
+    def _news_counts_path(self):
+        return os.path.join(self.exp_path, "news_counts.json")
+
+    def _news_count_key(self, asset):
+        start, end = self._window()
+        inputs = self._source_inputs("news", self.news_path, asset)
+        return hashlib.sha256(json.dumps(dict(inputs=fingerprint(inputs), start=start, end=end, version=source_version()),
+                                         default=str).encode()).hexdigest()[:16]
+
+    def _count_news(self, asset):
+        """Rows of an asset's news left after dropna, read with arrow without building the frame."""
+        if asset not in self.news_counts and self.snapshot is not None:
+            num_rows = self.snapshot.num_rows("news", asset, self._source_inputs("news", self.news_path, asset))
+            if num_rows is not None:
+                self.news_counts[asset] = num_rows
+        if asset not in self.news_counts and self.partitioned_path is None:
+            # no missing values in the footer statistics, every row is kept
+            metadata = pq.ParquetFile(os.path.join(self.news_path, "{}.parquet".format(asset))).metadata
+            columns = [metadata.schema.column(index) for index in range(metadata.num_columns)]
+            required = [index for index, column in enumerate(columns) if column.name in self._required_columns([column.name])]
+            statistics = [metadata.row_group(group).column(index).statistics
+                          for group in range(metadata.num_row_groups) for index in required]
+            if all([columns[index].physical_type not in ["FLOAT", "DOUBLE"] for index in required]) and \
+                    all([stat is not None and stat.has_null_count and stat.null_count == 0 for stat in statistics]):
+                self.news_counts[asset] = metadata.num_rows
+        if asset not in self.news_counts:
+            table = self._read_source("news", self.news_path, asset, as_table=True)
+            valid = None
+            for column in [table[name] for name in self._required_columns(table.column_names)]:
+                column_valid = pc.invert(pc.is_null(column, nan_is_null=True))
+                valid = column_valid if valid is None else pc.and_(valid, column_valid)
+            self.news_counts[asset] = table.num_rows if valid is None else pc.sum(valid.cast("int64")).as_py() or 0
+        return self.news_counts[asset]
+
+    def _news_offset(self, asset):
+        """
+        First news id of an asset, ids continue across the assets in the order of the asset list.
+        news_offsets holds the cumulative counts of the assets seen so far and only grows up to the
+        requested asset. The counts are kept in news_counts.json next to the outputs, keyed by the
+        input files, so later runs read none of the other assets' news.
+        """
+        if self.news_offsets is None:
+            self.news_offsets = [0]
+            self.news_index = {name: index for index, name in enumerate(self.assets)}
+            self.stored_news_counts = {}
+            path = self._news_counts_path()
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf8") as op:
+                        self.stored_news_counts = json.load(op)
+                except ValueError:
+                    self.stored_news_counts = {}
+
+        index = self.news_index[asset]
+        if len(self.news_offsets) <= index:
+            changed = False
+            for name in self.assets[len(self.news_offsets) - 1:index]:
+                key = self._news_count_key(name)
+                stored = self.stored_news_counts.get(name)
+                if stored is not None and stored["key"] == key:
+                    self.news_counts.setdefault(name, stored["count"])
+                count = self._count_news(name)
+                if stored is None or stored != dict(key=key, count=count):
+                    self.stored_news_counts[name] = dict(key=key, count=count)
+                    changed = True
+                self.news_offsets.append(self.news_offsets[-1] + count)
+
+            if changed:
+                path = self._news_counts_path()
+                tmp_path = "{}.{}.tmp".format(path, os.getpid())
+                with open(tmp_path, "w", encoding="utf8") as op:
+                    json.dump(self.stored_news_counts, op)
+                os.replace(tmp_path, path)
+
+        return self.news_offsets[index]
+
+    def _load_asset_news(self, asset):
+        global_id = self._news_offset(asset)
+
+        df = self._cached("news", self.news_path, asset, self._normalize_news)
+        df = self._compact(df, categories=["type", "source"], strings=["title", "text"])
+
+        if self.compact:
+            df["id"] = np.arange(global_id, global_id + len(df), dtype="int64")
+        else:
+            df["id"] = ["{:06d}".format(id) for id in range(global_id, global_id + len(df))]
 
-        news = {}
-
-        global_id = 0
-
-        for asset in self.assets:
-            path = os.path.join(self.news_path, "{}.parquet".format(asset))
-            df = pd.read_parquet(path)
+        df = df[["timestamp", "id", "type", "source", "title", "text"]]
 
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df["timestamp"] = df["timestamp"].apply(lambda x: x.strftime("%Y-%m-%d"))
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return df
 
-            df = df.dropna(axis=0, how="any")
-            df = df.sort_values(by="timestamp")
-            df = df.reset_index(drop=True)
+    def _normalize_news(self, asset):
+        df = self._read_source("news", self.news_path, asset)
 
-            df["id"] = df.index + global_id
-            df["id"] = df["id"].apply(lambda x: "{:06d}".format(x))
-            global_id += len(df)
+        df["timestamp"] = normalize_dates(df["timestamp"])
 
-            df = df[["timestamp", "id", "type", "source", "title", "text"]]
+        df = df.dropna(axis=0, how="any", subset=self._required_columns(df.columns))
+        df = df.sort_values(by="timestamp", kind="stable")
+        df = df.reset_index(drop=True)
 
-            news[asset] = df
+        df = df[["timestamp", "type", "source", "title", "text"]]
+        df = self._compact(df, categories=["type", "source"], strings=["title", "text"])
 
-        return news
+        return df
 
     def _load_guidances(self):
 
-        guidances = {}
-
         if self.guidance_path is None:
             return None
 
-        for asset in self.assets:
-            path = os.path.join(self.guidance_path, "{}.parquet".format(asset))
-            df = pd.read_parquet(path)
+        return self._asset_mapping(self._load_guidance)
 
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df["timestamp"] = df["timestamp"].apply(lambda x: x.strftime("%Y-%m-%d"))
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
+    def _load_guidance(self, asset):
+        df = self._cached("guidance", self.guidance_path, asset, self._normalize_guidance)
+        return self._compact(df, strings=["title", "text"])
 
-            df = df.dropna(axis=0, how="any")
-            df = df.sort_values(by="timestamp")
-            df = df.reset_index(drop=True)
+    def _normalize_guidance(self, asset):
+        df = self._read_source("guidance", self.guidance_path, asset)
 
-            df = df[["timestamp", "sentiment", "title", "text"]]
+        df["timestamp"] = normalize_dates(df["timestamp"])
 
-            guidances[asset] = df
+        df = df.dropna(axis=0, how="any", subset=self._required_columns(df.columns))
+        df = df.sort_values(by="timestamp", kind="stable")
+        df = df.reset_index(drop=True)
 
-        return guidances
+        df = df[["timestamp", "sentiment", "title", "text"]]
+        df = self._compact(df, strings=["title", "text"])
 
-    def _load_sentiments(self):
+        return df
 
-        sentiments = {}
+    def _load_sentiments(self):
 
         if self.sentiment_path is None:
             return None
 
-        for asset in self.assets:
-            path = os.path.join(self.sentiment_path, "{}.parquet".format(asset))
-            df = pd.read_parquet(path)
+        return self._asset_mapping(self._load_sentiment)
+
+    def _load_sentiment(self, asset):
+        return self._cached("sentiment", self.sentiment_path, asset, self._normalize_sentiment)
 
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df["timestamp"] = df["timestamp"].apply(lambda x: x.strftime("%Y-%m-%d"))
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
+    def _normalize_sentiment(self, asset):
+        df = self._read_source("sentiment", self.sentiment_path, asset)
 
-            df = df.dropna(axis=0, how="any")
-            df = df.sort_values(by="timestamp")
-            df = df.reset_index(drop=True)
+        df["timestamp"] = normalize_dates(df["timestamp"])
 
-            df = df[["timestamp",
-                     "stocktwits_posts",
-                     "stocktwits_comments",
-                     "stocktwits_likes",
-                     "stocktwits_impressions",
-                     "stocktwits_sentiment"]]
+        df = df.dropna(axis=0, how="any")
+        df = df.sort_values(by="timestamp", kind="stable")
+        df = df.reset_index(drop=True)
 
-            sentiments[asset] = df
+        df = df[["timestamp",
+                 "stocktwits_posts",
+                 "stocktwits_comments",
+                 "stocktwits_likes",
+                 "stocktwits_impressions",
+                 "stocktwits_sentiment"]]
 
-        return sentiments
+        return df
 
     def _load_economics(self):
 
         if self.economics_path is None:
             return None
 
+        if self.snapshot is None:
+            return self._normalize_economics()
+        return self.snapshot.cached("economic", "all", [self.economics_path], lambda _: self._normalize_economics())
+
+    def _normalize_economics(self):
         path = os.path.join(self.economics_path)
 
         economics = pd.read_parquet(path)
 
-        economics["timestamp"] = pd.to_datetime(economics["timestamp"])
-        economics["timestamp"] = economics["timestamp"].apply(lambda x: x.strftime("%Y-%m-%d"))
-        economics["timestamp"] = pd.to_datetime(economics["timestamp"])
+        economics["timestamp"] = normalize_dates(economics["timestamp"])
 
-        economics = economics.sort_values(by="timestamp")
+        economics = economics.sort_values(by="timestamp", kind="stable")
         economics = economics.reset_index(drop=True)
 
         economics = economics[["timestamp", "gdp", "cpi", "unemployment_rate", "federal_funds", "inflation_rate"]]
 
         return economics
 
+    def _align(self):
+        """Per-asset tables of the economics, sentiments and guidances aligned on the trading days."""
+        return self._asset_mapping(self._align_asset)
+
+    def _align_asset(self, asset):
+        return align_asset(self.prices[asset],
+                           economics_df=self.economics,
+                           sentiments_df=self.sentiments[asset] if self.sentiments is not None else None,
+                           guidances_df=self.guidances[asset] if self.guidances is not None else None,
+                           news_df=self.news[asset])
+
 if __name__ == '__main__':
 
     root = "workspace/RA/FinAgentPrivate"
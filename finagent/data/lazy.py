@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+
+class LazyAssetDict(Mapping):
+    """
+    Read-only {asset: value} mapping that calls loader(asset) on first access. With a capacity
+    at most that many assets stay resident, the least recently used one is dropped (and loaded
+    again if it is accessed later).
+    """
+    def __init__(self, assets, loader, capacity = None):
+        self.assets = list(assets)
+        self._keys = set(self.assets)
+        self.loader = loader
+        self.capacity = capacity
+        self.cache = OrderedDict()
+
+    def __getitem__(self, asset):
+        if asset not in self._keys:
+            raise KeyError(asset)
+        if asset in self.cache:
+            self.cache.move_to_end(asset)
+            return self.cache[asset]
+
+        value = self.loader(asset)
+        self.cache[asset] = value
+        if self.capacity is not None:
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return value
+
+    def __contains__(self, asset):
+        return asset in self._keys
+
+    def __iter__(self):
+        return iter(self.assets)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def loaded(self):
+        """Assets currently resident, least recently used first."""
+        return list(self.cache.keys())
+
+    def __repr__(self):
+        return "LazyAssetDict(assets={}, loaded={}, capacity={})".format(len(self.assets), len(self.cache), self.capacity)
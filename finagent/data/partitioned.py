@@ -0,0 +1,76 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# rows per parquet row group, small enough that a date filter skips most of a year
+ROW_GROUP_SIZE = 4096
+
+YEAR_PARTITIONING = ds.partitioning(pa.schema([("year", pa.int32())]), flavor="hive")
+
+def partition_path(root, source, asset):
+    return os.path.join(root, "source={}".format(source), "asset={}".format(asset))
+
+def write_partitioned(root, source, asset, df):
+    """
+    Replace the rows of (source, asset) in the hive-partitioned dataset at root with df:
+    root/source={source}/asset={asset}/year={year}/part-0.parquet, sorted by timestamp, with
+    row group statistics so date filters are pushed down to the row groups.
+    """
+    df = df.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = df.sort_values(by="timestamp", kind="stable").reset_index(drop=True)
+    df["year"] = df["timestamp"].dt.year.astype("int32")
+
+    path = partition_path(root, source, asset)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(table, tmp_path,
+                     format="parquet",
+                     partitioning=YEAR_PARTITIONING,
+                     basename_template="part-{i}.parquet",
+                     max_rows_per_group=ROW_GROUP_SIZE,
+                     min_rows_per_group=min(ROW_GROUP_SIZE, max(len(df), 1)),
+                     existing_data_behavior="overwrite_or_ignore")
+    if len(df) == 0:
+        # keep the schema of an empty source around
+        os.makedirs(tmp_path, exist_ok=True)
+        pq.write_table(table.drop(["year"]), os.path.join(tmp_path, "empty.parquet"))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+def read_partitioned(root, source, asset, start_date = None, end_date = None, columns = None, as_table = False):
+    """
+    Rows of (source, asset) with start_date <= timestamp <= end_date. Only the year partitions
+    inside the range are opened and row groups outside it are skipped through their statistics.
+    """
+    path = partition_path(root, source, asset)
+    empty_path = os.path.join(path, "empty.parquet")
+    if os.path.exists(empty_path):
+        table = pq.read_table(empty_path, columns=columns)
+        return table if as_table else table.to_pandas()
+
+    dataset = ds.dataset(path, format="parquet", partitioning=YEAR_PARTITIONING)
+
+    filter = None
+    timestamp_type = dataset.schema.field("timestamp").type
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date)
+        filter = (ds.field("year") >= start_date.year) & \
+                 (ds.field("timestamp") >= pa.scalar(start_date, type=timestamp_type))
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        end_filter = (ds.field("year") <= end_date.year) & \
+                     (ds.field("timestamp") <= pa.scalar(end_date, type=timestamp_type))
+        filter = end_filter if filter is None else filter & end_filter
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != "year"]
+    table = dataset.to_table(columns=columns, filter=filter)
+    table = table.sort_by("timestamp") if "timestamp" in table.column_names else table
+    return table if as_table else table.to_pandas()
@@ -0,0 +1,92 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import pyarrow as pa
+import pyarrow.feather as feather
+
+def _files(path):
+    """The files of an input, a single file or every file below a (partitioned) directory."""
+    if os.path.isdir(path):
+        return sorted([os.path.join(root, name) for root, _, names in os.walk(path) for name in names])
+    return [path] if os.path.exists(path) else []
+
+def fingerprint(paths):
+    """Cheap fingerprint of input files from their path, size and mtime."""
+    sha = hashlib.sha256()
+    for path in paths:
+        for file in _files(path):
+            stat = os.stat(file)
+            sha.update("{}:{}:{}\n".format(file, stat.st_size, stat.st_mtime_ns).encode())
+    return sha.hexdigest()[:16]
+
+def source_version():
+    """Hash of the Dataset loading code, snapshots written by other code are not reused."""
+    sha = hashlib.sha256()
+    for name in ["dataset.py", "snapshot.py", "partitioned.py"]:
+        with open(os.path.join(os.path.dirname(__file__), name), "rb") as op:
+            sha.update(op.read())
+    return sha.hexdigest()[:16]
+
+class SnapshotCache():
+    """
+    Arrow IPC (uncompressed Feather v2) snapshots of the normalized Dataset frames, one file per
+    source, asset and config at path/{source}/{asset}-{config key}-{inputs key}.arrow. The config
+    key hashes the dataset config and the loading code, the inputs key the fingerprint of the
+    input files, so a changed input or config simply misses. Saving a snapshot only replaces the
+    ones of older inputs with the same config, experiments with other configs keep theirs.
+    The files are memory-mapped when read and the numeric columns without missing values are
+    not copied into the frames, so processes reading the same snapshot share the page cache.
+    Such columns are read-only.
+    """
+    def __init__(self, path, config):
+        self.path = path
+        self.config_key = hashlib.sha256(json.dumps(dict(config, version=source_version()),
+                                                    sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def _file(self, source, asset, inputs):
+        return os.path.join(self.path, source, "{}-{}-{}.arrow".format(asset, self.config_key, fingerprint(inputs)))
+
+    def _read(self, source, asset, inputs):
+        file = self._file(source, asset, inputs)
+        if not os.path.exists(file):
+            return None
+        try:
+            return feather.read_table(file, memory_map=True)
+        except (pa.ArrowInvalid, OSError):
+            return None
+
+    def load(self, source, asset, inputs):
+        table = self._read(source, asset, inputs)
+        # split_blocks keeps every column in its own block, so they are not consolidated into copies
+        return table.to_pandas(split_blocks=True) if table is not None else None
+
+    def num_rows(self, source, asset, inputs):
+        table = self._read(source, asset, inputs)
+        return table.num_rows if table is not None else None
+
+    def save(self, source, asset, inputs, df):
+        file = self._file(source, asset, inputs)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmp_file = "{}.{}.tmp".format(file, os.getpid())
+        feather.write_feather(df, tmp_file, compression="uncompressed")
+        os.replace(tmp_file, file)
+
+        # drop the snapshots of older inputs of the same source, asset and config, the exact name
+        # only: the snapshots of "WFC-PT" also start with "WFC-"
+        pattern = re.compile(r"{}-{}-[0-9a-f]{{16}}\.arrow".format(re.escape(asset), self.config_key))
+        for stale in glob.glob(os.path.join(self.path, source, "{}-{}-*.arrow".format(glob.escape(asset), self.config_key))):
+            if stale != file and pattern.fullmatch(os.path.basename(stale)):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def cached(self, source, asset, inputs, loader):
+        """loader(asset) through the snapshot."""
+        df = self.load(source, asset, inputs)
+        if df is None:
+            df = loader(asset)
+            self.save(source, asset, inputs, df)
+        return df
@@ -1 +1,4 @@
-from .trading import EnvironmentTrading
\ No newline at end of file
+from .trading import EnvironmentTrading
+from .portfolio import EnvironmentPortfolioTrading
+from .vector import VectorEnvironmentTrading
+from .backtest import backtest
@@ -0,0 +1,97 @@
+import numpy as np
+from finagent.metrics import ARR, SR, CR, SOR, DD, MDD, VOL
+
+ACTION_MAP = {
+    "SELL": -1,
+    "HOLD": 0,
+    "BUY": 1,
+}
+
+def _metrics(ret):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = DD(ret)
+        mdd = MDD(ret)
+        return {
+            "ARR": float(ARR(ret)),
+            "SR": float(SR(ret)),
+            "CR": float(CR(ret, mdd)),
+            "SOR": float(SOR(ret, dd)),
+            "DD": float(dd),
+            "MDD": float(mdd),
+            "VOL": float(VOL(ret)),
+        }
+
+def backtest(actions, prices, initial_amount = 1e4, transaction_cost_pct = 1e-3, action_radius = 1, discount = 0.99):
+    """
+    Replay action sequences with the accounting of EnvironmentTrading.buy/sell/hold_on without
+    building any state: integer positions, the transaction cost on both sides and the actions
+    scaled by action_radius.
+
+    actions: (days,) or (batch, days) of env.action_map values or "BUY"/"HOLD"/"SELL".
+    prices: (days,) the price each action is taken at, env.price before each env.step, i.e.
+        prices_df["adj_close"] from env.init_day on.
+
+    The days are a recurrence on the cash, so they are looped over while every sequence of the
+    batch is updated at once. Returns the value, cash, position, ret, action (the action taken,
+    BUY/SELL with no shares to trade are a HOLD as in the env), total_profit and total_return
+    series after each step in the shape of actions, and metrics, the finagent.metrics of ret
+    (a list of them for a batch).
+    """
+    actions = np.asarray(actions)
+    if actions.dtype.kind in "UO":
+        actions = np.vectorize(ACTION_MAP.__getitem__, otypes=[np.int64])(actions)
+    single = actions.ndim == 1
+    actions = np.atleast_2d(actions).astype(np.int64)
+    prices = np.asarray(prices, dtype=np.float64).reshape(-1)
+
+    batch, days = actions.shape
+    if len(prices) < days:
+        raise ValueError("{} prices for {} days of actions".format(len(prices), days))
+
+    cash = np.full(batch, float(initial_amount))
+    position = np.zeros(batch, dtype=np.int64)
+    value = cash.copy()
+    scales = 1.0 * np.abs(actions / action_radius)
+
+    values = np.empty((batch, days))
+    cashs = np.empty((batch, days))
+    positions = np.empty((batch, days), dtype=np.int64)
+    rets = np.empty((batch, days))
+    taken = np.zeros((batch, days), dtype=np.int64)
+
+    for day in range(days):
+        price = prices[day]
+        action = actions[:, day]
+        scale = scales[:, day]
+        pre_value = value
+
+        buy_position = np.where(action > 0, np.floor(scale * np.floor(cash / price / (1 + transaction_cost_pct))), 0).astype(np.int64)
+        sell_position = np.where(action < 0, np.floor(scale * position), 0).astype(np.int64)
+
+        cash = cash - buy_position * price * (1 + transaction_cost_pct) + sell_position * price * (1 - transaction_cost_pct)
+        position = position + buy_position - sell_position
+        value = cash + position * price
+
+        values[:, day] = value
+        cashs[:, day] = cash
+        positions[:, day] = position
+        rets[:, day] = (value - pre_value) / pre_value
+        taken[:, day] = np.sign(buy_position) - np.sign(sell_position)
+
+    total_profit = 100 * (values - initial_amount) / initial_amount
+    total_return = np.cumsum(rets * discount ** np.arange(days), axis=1)
+    metrics = [_metrics(ret) for ret in rets]
+
+    res = {
+        "value": values,
+        "cash": cashs,
+        "position": positions,
+        "ret": rets,
+        "action": taken,
+        "total_profit": total_profit,
+        "total_return": total_return,
+    }
+    if single:
+        res = {key: series[0] for key, series in res.items()}
+    res["metrics"] = metrics[0] if single else metrics
+    return res
@@ -0,0 +1,191 @@
+from typing import Any, List
+import numpy as np
+import gym
+from finagent.registry import ENVIRONMENT
+from finagent.environment.trading import EnvironmentTrading
+
+@ENVIRONMENT.register_module(force=True)
+class EnvironmentPortfolioTrading(gym.Env):
+    """
+    Trades a portfolio of assets of one dataset with a shared cash and a vector of positions.
+
+    The portfolio steps over the trading days common to all assets. Each step takes one action
+    per asset (env.action_map values or "BUY"/"HOLD"/"SELL", a list in the order of
+    selected_assets or a {asset: action} dict). The sells are applied first, then the cash is
+    split equally among the assets to buy. Positions and costs follow EnvironmentTrading, so a
+    portfolio of one asset trades as EnvironmentTrading does. The states are {asset: state} with
+    the windows of EnvironmentTrading.get_state.
+    """
+    def __init__(self,
+                 mode: str = "train",
+                 dataset: Any = None,
+                 selected_assets: List[str] = None,
+                 asset_type: str = "company",
+                 start_date: str = None,
+                 end_date: str = None,
+                 look_back_days: int = 14,
+                 look_forward_days: int = 14,
+                 initial_amount: float = 1e4,
+                 transaction_cost_pct: float = 1e-3,
+                 discount: float = 1.0,
+                 ):
+        super(EnvironmentPortfolioTrading, self).__init__()
+
+        self.mode = mode
+        self.dataset = dataset
+        self.selected_assets = list(selected_assets) if selected_assets is not None else list(dataset.assets)
+        self.asset_type = asset_type
+        self.symbols = self.selected_assets
+
+        self.initial_amount = initial_amount
+        self.transaction_cost_pct = transaction_cost_pct
+        self.discount = discount
+
+        # one single-asset environment per asset, used for its frames and get_state windows
+        self.envs = [EnvironmentTrading(mode=mode,
+                                        dataset=dataset,
+                                        selected_asset=asset,
+                                        asset_type=asset_type,
+                                        start_date=start_date,
+                                        end_date=end_date,
+                                        look_back_days=look_back_days,
+                                        look_forward_days=look_forward_days,
+                                        initial_amount=initial_amount,
+                                        transaction_cost_pct=transaction_cost_pct,
+                                        discount=discount) for asset in self.selected_assets]
+
+        # trading days common to all assets and the row of each day in every asset's prices
+        calendar = self.envs[0].prices_df.index
+        for env in self.envs[1:]:
+            calendar = calendar.intersection(env.prices_df.index)
+        self.calendar = calendar.sort_values()
+        self.asset_days = np.stack([env.prices_df.index.get_indexer(self.calendar) for env in self.envs])
+        self.asset_prices = np.stack([env.prices_df["adj_close"].values[days] for env, days in zip(self.envs, self.asset_days)])
+
+        self.start_date = self.envs[0].start_date
+        self.end_date = self.envs[0].end_date
+        self.init_day = int(np.searchsorted(self.calendar.values, np.datetime64(self.start_date), side="left"))
+        self.end_day = int(np.searchsorted(self.calendar.values, np.datetime64(self.end_date), side="right")) - 1
+
+        self.action_map = {
+            "SELL": -1,
+            "HOLD": 0,
+            "BUY": 1,
+        }
+        self.action_names = {value: key for key, value in self.action_map.items()}
+
+        self.action_dim = 3  # buy, hold, sell
+        self.action_radius = int(np.floor(self.action_dim / 2))
+
+        self.num_assets = len(self.selected_assets)
+        self.reset()
+
+    def get_current_date(self):
+        return self.calendar[self.day]
+
+    def get_current_prices(self):
+        return self.asset_prices[:, self.day]
+
+    def current_value(self, prices):
+        return self.cash + float(np.dot(self.positions, prices))
+
+    def get_state(self):
+        state = {}
+        for asset, env, days in zip(self.selected_assets, self.envs, self.asset_days):
+            env.day = days[self.day]
+            state[asset] = env.get_state()
+        return state
+
+    def _parse_actions(self, actions):
+        if isinstance(actions, dict):
+            actions = [actions.get(asset, 0) for asset in self.selected_assets]
+        actions = [self.action_map[action] if isinstance(action, str) else action for action in actions]
+        actions = np.asarray(actions, dtype=np.int64).reshape(-1)
+        if len(actions) != self.num_assets:
+            raise ValueError("{} actions for {} assets".format(len(actions), self.num_assets))
+        return actions
+
+    def trade(self, prices, actions):
+        """Sell, then buy with the cash split equally among the buys, in one vectorized update."""
+        scales = 1.0 * np.abs(actions / self.action_radius)
+
+        sell_positions = np.where(actions < 0, np.floor(scales * self.positions), 0).astype(np.int64)
+        self.cash += float(np.sum(sell_positions * prices * (1 - self.transaction_cost_pct)))
+        self.positions = self.positions - sell_positions
+
+        buys = actions > 0
+        budget = self.cash / max(int(buys.sum()), 1)
+        eval_buy_positions = np.floor(budget / prices / (1 + self.transaction_cost_pct))
+        buy_positions = np.where(buys, np.floor(scales * eval_buy_positions), 0).astype(np.int64)
+        self.cash -= float(np.sum(buy_positions * prices * (1 + self.transaction_cost_pct)))
+        self.positions = self.positions + buy_positions
+
+        taken = np.sign(buy_positions) - np.sign(sell_positions)
+        self.actions = [self.action_names[action] for action in taken]
+        self.value = self.current_value(prices)
+
+    def get_info(self):
+        return {
+            "symbol": [str(symbol) for symbol in self.symbols],
+            "asset_type": str(self.asset_type),
+            "day": int(self.day),
+            "value": float(self.value),
+            "cash": float(self.cash),
+            "position": [int(position) for position in self.positions],
+            "ret": float(self.ret),
+            "date": self.date.strftime('%Y-%m-%d'),
+            "price": [float(price) for price in self.prices],
+            "discount": float(self.discount),
+            "total_profit": float(self.total_profit),
+            "total_return": float(self.total_return),
+            "action": list(self.actions),
+        }
+
+    def reset(self, **kwargs):
+        self.day = self.init_day
+        self.value = self.initial_amount
+        self.cash = self.initial_amount
+        self.positions = np.zeros(self.num_assets, dtype=np.int64)
+        self.ret = 0
+        self.date = self.get_current_date()
+        self.prices = self.get_current_prices()
+        self.discount = 1.0
+        self.total_return = 0
+        self.total_profit = 0
+        self.actions = ["HOLD"] * self.num_assets
+
+        state = self.get_state()
+
+        return state, self.get_info()
+
+    def step(self, actions = None):
+
+        actions = self._parse_actions(actions if actions is not None else [0] * self.num_assets)
+
+        pre_value = self.value
+        self.trade(self.prices, actions)
+        post_value = self.value
+
+        reward = (post_value - pre_value) / pre_value
+
+        self.day = self.day + 1
+
+        if self.day < self.end_day:
+            done = False
+            truncted = False
+        else:
+            done = True
+            truncted = True
+
+        next_state = self.get_state()
+        self.state = next_state
+
+        self.ret = reward
+        self.date = self.get_current_date()
+
+        self.prices = self.get_current_prices()
+        self.total_return += self.discount * reward
+        self.discount *= 0.99
+        self.total_profit = 100 * (self.value - self.initial_amount) / self.initial_amount
+
+        return next_state, reward, done, truncted, self.get_info()
@@ -51,6 +51,13 @@ class EnvironmentTrading(gym.Env):
         else:
             self.economics_df = None
 
+        # sparse sources aligned on the trading days, the row of a day is the row of its price
+        aligned = getattr(self.dataset, "aligned", None)
+        if aligned is not None:
+            self.aligned_df = aligned[self.selected_asset]
+        else:
+            self.aligned_df = None
+
         self.start_date = start_date
         self.end_date = end_date
         self.start_date = datetime.strptime(self.start_date, "%Y-%m-%d")
@@ -86,6 +93,8 @@ class EnvironmentTrading(gym.Env):
         if self.economics_df is not None:
             self.economics_df = self.economics_df.set_index("timestamp")
 
+        self._init_window_index()
+
         self.day = self.init_day
         self.value = self.initial_amount
         self.cash = self.initial_amount
@@ -121,38 +130,50 @@ class EnvironmentTrading(gym.Env):
         days_ago = self.prices_df.index[self.day - self.look_back_days]
         days_future = self.prices_df.index[min(self.day + self.look_forward_days, len(self.prices_df) - 1)]
 
-        price = self.prices_df[self.prices_df.index <= days_future]
-        price = price[price.index >= days_ago]
-
-        news = self.news_df[self.news_df.index <= days_future]
-        news = news[news.index >= days_ago]
-
-        if self.guidances_df is not None:
-            guidance = self.guidances_df[self.guidances_df.index <= days_future]
-            guidance = guidance[guidance.index >= days_ago]
-        else:
-            guidance = None
-
-        if self.sentiments_df is not None:
-            sentiment = self.sentiments_df[self.sentiments_df.index <= days_future]
-            sentiment = sentiment[sentiment.index >= days_ago]
-        else:
-            sentiment = None
-
-        if self.economics_df is not None:
-            economic = self.economics_df[self.economics_df.index <= days_future]
-            economic = economic[economic.index >= days_ago]
-        else:
-            economic = None
+        price = self._window_slice("price", self.prices_df, days_ago, days_future)
+        news = self._window_slice("news", self.news_df, days_ago, days_future)
+        guidance = self._window_slice("guidance", self.guidances_df, days_ago, days_future)
+        sentiment = self._window_slice("sentiment", self.sentiments_df, days_ago, days_future)
+        economic = self._window_slice("economic", self.economics_df, days_ago, days_future)
 
         state["price"] = price
         state["news"] = news
         state["guidance"] = guidance
         state["sentiment"] = sentiment
         state["economic"] = economic
+        state["aligned"] = self.get_aligned()
 
         return state
 
+    def _init_window_index(self):
+        """Sorted timestamp arrays of the frames, get_state slices them with searchsorted."""
+        self.window_index = {}
+        for name, df in [("price", self.prices_df),
+                         ("news", self.news_df),
+                         ("guidance", self.guidances_df),
+                         ("sentiment", self.sentiments_df),
+                         ("economic", self.economics_df)]:
+            if df is not None and df.index.is_monotonic_increasing:
+                self.window_index[name] = df.index.values
+
+    def _window_slice(self, name, df, days_ago, days_future):
+        """Rows of df with days_ago <= timestamp <= days_future, a contiguous iloc range for sorted frames."""
+        if df is None:
+            return None
+        index = self.window_index.get(name)
+        if index is None:
+            df = df[df.index <= days_future]
+            return df[df.index >= days_ago]
+        start = np.searchsorted(index, np.datetime64(days_ago), side="left")
+        end = np.searchsorted(index, np.datetime64(days_future), side="right")
+        return df.iloc[start:end]
+
+    def get_aligned(self, day = None):
+        """The aligned economic/sentiment/guidance values known on a day (default today)."""
+        if self.aligned_df is None:
+            return None
+        return self.aligned_df.iloc[self.day if day is None else day]
+
     def reset(self, **kwargs):
         self.day = self.init_day
         self.value = self.initial_amount
@@ -168,7 +189,10 @@ class EnvironmentTrading(gym.Env):
 
         state = self.get_state()
 
-        info = {
+        return state, self.get_info()
+
+    def get_info(self):
+        return {
             "symbol": str(self.symbol),
             "asset_type": str(self.asset_type),
             "day": int(self.day),
@@ -181,10 +205,49 @@ class EnvironmentTrading(gym.Env):
             "discount": float(self.discount),
             "total_profit": float(self.total_profit),
             "total_return": float(self.total_return),
-            "action": self.action
+            "action": str(self.action)
+        }
+
+    def get_snapshot(self):
+        """The account state after the last step, JSON serializable, restore jumps back to it."""
+        return {
+            "symbol": str(self.symbol),
+            "date": self.date.strftime('%Y-%m-%d'),
+            "day": int(self.day),
+            "cash": float(self.cash),
+            "position": int(self.position),
+            "value": float(self.value),
+            "ret": float(self.ret),
+            "discount": float(self.discount),
+            "total_return": float(self.total_return),
+            "total_profit": float(self.total_profit),
+            "action": str(self.action),
         }
 
-        return state, info
+    def restore(self, snapshot):
+        """Jump to the day of a get_snapshot without replaying the steps, returns the state and info of that day."""
+        if snapshot["symbol"] != str(self.symbol):
+            raise ValueError("snapshot of {} restored into the environment of {}".format(snapshot["symbol"], self.symbol))
+
+        self.day = snapshot["day"]
+        self.cash = snapshot["cash"]
+        self.position = snapshot["position"]
+        self.value = snapshot["value"]
+        self.ret = snapshot["ret"]
+        self.discount = snapshot["discount"]
+        self.total_return = snapshot["total_return"]
+        self.total_profit = snapshot["total_profit"]
+        self.action = snapshot["action"]
+        self.date = self.get_current_date()
+        self.price = self.get_current_price()
+
+        if self.date.strftime('%Y-%m-%d') != snapshot["date"]:
+            raise ValueError("snapshot of {} restored on {}, the prices differ".format(snapshot["date"], self.date.strftime('%Y-%m-%d')))
+
+        state = self.get_state()
+        self.state = state
+
+        return state, self.get_info()
 
     def eval_buy_position(self, price):
         # evaluate buy position
@@ -270,21 +333,7 @@ class EnvironmentTrading(gym.Env):
         self.discount *= 0.99
         self.total_profit = 100 * (self.value - self.initial_amount) / self.initial_amount
 
-        info = {
-            "symbol": str(self.symbol),
-            "asset_type": str(self.asset_type),
-            "day": int(self.day),
-            "value": float(self.value),
-            "cash": float(self.cash),
-            "position": int(self.position),
-            "ret": float(self.ret),
-            "date": self.date.strftime('%Y-%m-%d'),
-            "price": float(self.price),
-            "discount": float(self.discount),
-            "total_profit": float(self.total_profit),
-            "total_return": float(self.total_return),
-            "action": str(self.action)
-        }
+        info = self.get_info()
 
         return next_state, reward, done, truncted, info
 
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+import numpy as np
+from finagent.registry import ENVIRONMENT
+
+@ENVIRONMENT.register_module(force=True)
+class VectorEnvironmentTrading():
+    """
+    Steps N trading environments (assets or experiment variants) built on one shared dataset in
+    lockstep. environments are built environments or environment configs, the configs are built
+    with the shared dataset. An environment that is done is not stepped again, its last state,
+    info and done are repeated until all are done.
+
+    The day's states and infos are kept together in states/infos, map runs a function (the LLM
+    and embedding calls of a day) over the active environments concurrently.
+    """
+    def __init__(self,
+                 environments: List[Any] = None,
+                 dataset: Any = None,
+                 max_workers: int = None,
+                 ):
+        self.dataset = dataset
+        self.envs = []
+        for env in environments:
+            if isinstance(env, dict):
+                env = ENVIRONMENT.build(dict(env, dataset=dataset))
+            self.envs.append(env)
+        self.num_envs = len(self.envs)
+        self.max_workers = max_workers if max_workers is not None else self.num_envs
+
+        self.states = [None] * self.num_envs
+        self.infos = [None] * self.num_envs
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+
+    def __len__(self):
+        return self.num_envs
+
+    def active(self):
+        """Indices of the environments that are not done."""
+        return [index for index in range(self.num_envs) if not self.dones[index]]
+
+    def reset(self, **kwargs):
+        for index, env in enumerate(self.envs):
+            self.states[index], self.infos[index] = env.reset(**kwargs)
+        self.dones[:] = False
+        return list(self.states), list(self.infos)
+
+    def step(self, actions):
+        """One action per environment, the actions of done environments are ignored."""
+        if len(actions) != self.num_envs:
+            raise ValueError("{} actions for {} environments".format(len(actions), self.num_envs))
+
+        rewards = np.zeros(self.num_envs)
+        truncateds = self.dones.copy()
+        for index in self.active():
+            state, reward, done, truncated, info = self.envs[index].step(actions[index])
+            self.states[index] = state
+            self.infos[index] = info
+            rewards[index] = reward
+            self.dones[index] = done
+            truncateds[index] = truncated
+
+        return list(self.states), rewards, self.dones.copy(), truncateds, list(self.infos)
+
+    def map(self, fn, max_workers = None):
+        """
+        fn(index, state, info) for every active environment, run concurrently on threads. Returns
+        the results in the order of the environments, None for the environments that are done.
+        """
+        indices = self.active()
+        results = [None] * self.num_envs
+        max_workers = max_workers if max_workers is not None else self.max_workers
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(indices)), 1)) as executor:
+            futures = {index: executor.submit(fn, index, self.states[index], self.infos[index]) for index in indices}
+            for index, future in futures.items():
+                results[index] = future.result()
+        return results
@@ -71,6 +71,16 @@ class BaseMemory:
         """
         pass
 
+    def add_many(
+        self,
+        datas: List[Dict],
+        embedding_key: str,
+        **kwargs: Any,
+    ) -> None:
+        """Add a batch of data to memory, one add per item unless a subclass inserts them at once."""
+        for data in datas:
+            self.add(data = data, embedding_key = embedding_key, **kwargs)
+
     @abc.abstractmethod
     def similarity_search(
         self,
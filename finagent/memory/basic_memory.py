@@ -45,6 +45,29 @@ class BasicMemory(BaseMemory):
 
         self.vectorstore.add_embeddings([name], [embeddings])
 
+    def add_many(
+            self,
+            datas: List[Dict],
+            embedding_key: str,
+            **kwargs,
+    ) -> None:
+        """
+        Add a batch of data to memory with a single vectorstore insert.
+        """
+        if len(datas) == 0:
+            return
+
+        name = time.strftime("%Y-%m-%d-%H:%M:%S", time.localtime())
+        names = ["{}-{:06d}".format(name, len(self.memory) + index) for index in range(len(datas))]  # unique ids of the added units
+
+        embeddings = []
+        for name, data in zip(names, datas):
+            assert embedding_key in data, f"embedding_key {embedding_key} not in data"
+            self.memory[name] = data
+            embeddings.append(data[embedding_key])
+
+        self.vectorstore.add_embeddings(names, embeddings)
+
     def similarity_search(
             self,
             data: Dict,
@@ -112,6 +112,17 @@ class MemoryInterface():
         memory.add(data = data, embedding_key = embedding_key)
         print(f"Add memory for {type} {symbol}.")
 
+    def add_memories(
+        self,
+        type: str,
+        symbol: str,
+        datas: List[Dict],
+        embedding_key: str,
+    ) -> None:
+        memory = self._get_memory(type, symbol)
+        memory.add_many(datas = datas, embedding_key = embedding_key)
+        print(f"Add {len(datas)} memories for {type} {symbol}.")
+
     def query_memory(
         self,
         type: str,
@@ -0,0 +1,93 @@
+import re
+import zlib
+import numpy as np
+
+# MinHash uses the universal hashes (a * x + b) mod MERSENNE_PRIME of the 32 bit shingle hashes,
+# a < 2 ** 31 keeps a * x inside uint64
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def shingles(text, k=3):
+    """Word k-grams of the lower-cased text, single words for texts shorter than k words."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < k:
+        return set(words)
+    return set([" ".join(words[index: index + k]) for index in range(len(words) - k + 1)])
+
+def lsh_params(threshold, num_perm):
+    """
+    (bands, rows) with bands * rows <= num_perm whose S-curve (1 / bands) ** (1 / rows) is
+    closest to the threshold, i.e. pairs above the threshold most likely share a bucket.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+class MinHashDeduplicator():
+    """
+    Near-duplicate detection with MinHash signatures and LSH banding. Documents are scanned
+    in time order; a document is a duplicate when its estimated Jaccard similarity with an
+    earlier kept document is at least `threshold` and the two are at most `window` apart.
+    """
+    def __init__(self, threshold=0.8, window=1, num_perm=128, shingle_size=3, seed=1):
+        self.threshold = threshold
+        self.window = window
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text):
+        tokens = shingles(text, k=self.shingle_size)
+        if len(tokens) == 0:
+            return None
+        hashes = np.array([zlib.crc32(token.encode("utf8")) for token in tokens], dtype=np.uint64)
+        values = ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME) & MAX_HASH
+        return values.min(axis=1)
+
+    def duplicates(self, texts, times):
+        """
+        texts: documents in time order, times: their positions on the time axis (e.g. days)
+        in the same unit as window. Returns a boolean mask of the rows to drop.
+        """
+        mask = np.zeros(len(texts), dtype=bool)
+        signatures = {}
+        buckets = [{} for _ in range(self.bands)]
+
+        for index, (text, time) in enumerate(zip(texts, times)):
+            signature = self.signature(text)
+            if signature is None:
+                continue
+
+            keys = [signature[band * self.rows: (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+            candidates = set()
+            for band, key in enumerate(keys):
+                candidates.update(buckets[band].get(key, []))
+
+            for candidate in sorted(candidates):
+                if time - times[candidate] > self.window:
+                    continue
+                if (signatures[candidate] == signature).mean() >= self.threshold:
+                    mask[index] = True
+                    break
+
+            if mask[index]:
+                continue
+
+            signatures[index] = signature
+            for band, key in enumerate(keys):
+                bucket = buckets[band].setdefault(key, [])
+                # kept documents older than the window can never match again
+                while len(bucket) > 0 and time - times[bucket[0]] > self.window:
+                    bucket.pop(0)
+                bucket.append(index)
+
+        return mask
@@ -0,0 +1,328 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from finagent.processor.kernels import rolling_rank, rolling_argmax, rolling_argmin
+
+# rolling windows of the factors, the ret1 based factors need one more bar than the largest window
+FACTOR_WINDOWS = [5, 10, 20, 30, 60]
+FACTOR_LOOKBACK = max(FACTOR_WINDOWS) + 1
+
+def my_rank(x):
+   return pd.Series(x).rank(pct=True).iloc[-1]
+
+class Factor():
+    def __init__(self, name, inputs, window=None, fn=None):
+        self.name = name
+        self.inputs = inputs
+        self.window = window
+        self.fn = fn
+
+    def __repr__(self):
+        return "Factor(name={}, inputs={}, window={})".format(self.name, self.inputs, self.window)
+
+# name -> Factor, in the column order of cal_factor
+FACTORS = {}
+
+# name -> fn(context), shared intermediate series
+INTERMEDIATES = {}
+
+def register_factor(name, inputs, window=None):
+    def decorator(fn):
+        FACTORS[name] = Factor(name, inputs, window=window, fn=fn)
+        return fn
+    return decorator
+
+def register_factor_family(prefix, inputs, windows=FACTOR_WINDOWS):
+    """Register {prefix}_{w} for every window, fn(context, w)."""
+    def decorator(fn):
+        for w in windows:
+            name = "{}_{}".format(prefix, w)
+            FACTORS[name] = Factor(name, inputs, window=w, fn=partial(fn, w=w))
+        return fn
+    return decorator
+
+def register_intermediate(name):
+    def decorator(fn):
+        INTERMEDIATES[name] = fn
+        return fn
+    return decorator
+
+def select_factors(names=None):
+    """Resolve factor names (or family prefixes such as "ma") to registered names in column order."""
+    if names is None:
+        return list(FACTORS.keys())
+    selected = set()
+    for name in names:
+        if name in FACTORS:
+            selected.add(name)
+        else:
+            family = [key for key in FACTORS if key.rsplit("_", 1)[0] == name]
+            if len(family) == 0:
+                raise KeyError("Unknown factor: {}".format(name))
+            selected.update(family)
+    return [key for key in FACTORS if key in selected]
+
+class FactorContext():
+    """
+    Evaluates registered factors over a frame with open/high/low/close/volume columns, or a dict
+    of (bar x asset) frames for the panel engine. Intermediates, shifts, rolling aggregates and
+    factors are computed once per (column, window) and reused by every factor that needs them.
+    """
+    def __init__(self, data, engine="numpy"):
+        self.data = data
+        self.engine = engine
+        self.cache = {}
+
+    def _cached(self, key, fn):
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return self.cache[key]
+
+    def __getitem__(self, name):
+        if name in INTERMEDIATES:
+            return self._cached(name, partial(INTERMEDIATES[name], self))
+        return self.data[name]
+
+    def shift(self, column, w):
+        return self._cached(("shift", column, w), lambda: self[column].shift(w))
+
+    def rolling(self, column, w, agg, *args):
+        def fn():
+            rolling = self[column].rolling(w)
+            if agg == "quantile":
+                return rolling.quantile(*args)
+            elif agg == "corr":
+                return rolling.corr(self[args[0]], pairwise=False)
+            return getattr(rolling, agg)()
+        return self._cached(("rolling", column, w, agg) + args, fn)
+
+    def rolling_kernel(self, column, w, kernel):
+        def fn():
+            values = self[column]
+            if self.engine == "numpy":
+                result = {"rank": rolling_rank, "argmax": rolling_argmax, "argmin": rolling_argmin}[kernel](values.values, w)
+                if isinstance(values, pd.Series):
+                    return pd.Series(result, index=values.index)
+                return pd.DataFrame(result, index=values.index, columns=values.columns)
+            return values.rolling(w).apply({"rank": my_rank, "argmax": np.argmax, "argmin": np.argmin}[kernel])
+        return self._cached(("kernel", column, w, kernel), fn)
+
+    def factor(self, name):
+        return self._cached(("factor", name), partial(FACTORS[name].fn, self))
+
+    def evaluate(self, names=None):
+        names = select_factors(names)
+        for name in names:
+            for column in FACTORS[name].inputs:
+                assert column in self.data, "Factor {} needs column {}".format(name, column)
+        return {name: self.factor(name) for name in names}
+
+@register_intermediate("max_oc")
+def _max_oc(ctx):
+    return np.fmax(ctx["open"], ctx["close"])
+
+@register_intermediate("min_oc")
+def _min_oc(ctx):
+    return np.fmin(ctx["open"], ctx["close"])
+
+@register_intermediate("hl")
+def _hl(ctx):
+    return ctx["high"] - ctx["low"] + 1e-12
+
+@register_intermediate("ret1")
+def _ret1(ctx):
+    return ctx["close"].pct_change(1)
+
+@register_intermediate("abs_ret1")
+def _abs_ret1(ctx):
+    return np.abs(ctx["ret1"])
+
+@register_intermediate("pos_ret1")
+def _pos_ret1(ctx):
+    return ctx["ret1"].mask(ctx["ret1"].lt(0), 0)
+
+@register_intermediate("ret1_gt0")
+def _ret1_gt0(ctx):
+    return ctx["ret1"].gt(0)
+
+@register_intermediate("ret1_lt0")
+def _ret1_lt0(ctx):
+    return ctx["ret1"].lt(0)
+
+@register_intermediate("close_ratio")
+def _close_ratio(ctx):
+    return ctx["close"] / ctx.shift("close", 1)
+
+@register_intermediate("wv")
+def _wv(ctx):
+    return np.abs((ctx["close_ratio"] - 1)) * ctx["volume"]
+
+@register_intermediate("vchg1")
+def _vchg1(ctx):
+    return ctx["volume"] - ctx.shift("volume", 1)
+
+@register_intermediate("abs_vchg1")
+def _abs_vchg1(ctx):
+    return np.abs(ctx["vchg1"])
+
+@register_intermediate("pos_vchg1")
+def _pos_vchg1(ctx):
+    return ctx["vchg1"].mask(ctx["vchg1"].lt(0), 0)
+
+@register_intermediate("log_volume")
+def _log_volume(ctx):
+    return np.log(ctx["volume"] + 1)
+
+@register_factor("kmid", ["open", "close"])
+def _kmid(ctx):
+    return (ctx["close"] - ctx["open"]) / ctx["close"]
+
+@register_factor("kmid2", ["open", "high", "low", "close"])
+def _kmid2(ctx):
+    return (ctx["close"] - ctx["open"]) / ctx["hl"]
+
+@register_factor("klen", ["open", "high", "low"])
+def _klen(ctx):
+    return (ctx["high"] - ctx["low"]) / ctx["open"]
+
+@register_factor("kup", ["open", "high", "close"])
+def _kup(ctx):
+    return (ctx["high"] - ctx["max_oc"]) / ctx["open"]
+
+@register_factor("kup2", ["open", "high", "low", "close"])
+def _kup2(ctx):
+    return (ctx["high"] - ctx["max_oc"]) / ctx["hl"]
+
+@register_factor("klow", ["open", "low", "close"])
+def _klow(ctx):
+    return (ctx["min_oc"] - ctx["low"]) / ctx["open"]
+
+@register_factor("klow2", ["open", "high", "low", "close"])
+def _klow2(ctx):
+    return (ctx["min_oc"] - ctx["low"]) / ctx["hl"]
+
+@register_factor("ksft", ["open", "high", "low", "close"])
+def _ksft(ctx):
+    return (2 * ctx["close"] - ctx["high"] - ctx["low"]) / ctx["open"]
+
+@register_factor("ksft2", ["high", "low", "close"])
+def _ksft2(ctx):
+    return (2 * ctx["close"] - ctx["high"] - ctx["low"]) / ctx["hl"]
+
+@register_factor_family("roc", ["close"])
+def _roc(ctx, w):
+    return ctx.shift("close", w) / ctx["close"]
+
+@register_factor_family("ma", ["close"])
+def _ma(ctx, w):
+    return ctx.rolling("close", w, "mean") / ctx["close"]
+
+@register_factor_family("std", ["close"])
+def _std(ctx, w):
+    return ctx.rolling("close", w, "std") / ctx["close"]
+
+@register_factor_family("beta", ["close"])
+def _beta(ctx, w):
+    return (ctx.shift("close", w) - ctx["close"]) / (w * ctx["close"])
+
+@register_factor_family("max", ["close"])
+def _max(ctx, w):
+    return ctx.rolling("close", w, "max") / ctx["close"]
+
+@register_factor_family("min", ["close"])
+def _min(ctx, w):
+    return ctx.rolling("close", w, "min") / ctx["close"]
+
+@register_factor_family("qtlu", ["close"])
+def _qtlu(ctx, w):
+    return ctx.rolling("close", w, "quantile", 0.8) / ctx["close"]
+
+@register_factor_family("qtld", ["close"])
+def _qtld(ctx, w):
+    return ctx.rolling("close", w, "quantile", 0.2) / ctx["close"]
+
+@register_factor_family("rank", ["close"])
+def _rank(ctx, w):
+    return ctx.rolling_kernel("close", w, "rank") / w
+
+@register_factor_family("imax", ["high"])
+def _imax(ctx, w):
+    return ctx.rolling_kernel("high", w, "argmax") / w
+
+@register_factor_family("imin", ["low"])
+def _imin(ctx, w):
+    return ctx.rolling_kernel("low", w, "argmin") / w
+
+@register_factor_family("imxd", ["high", "low"])
+def _imxd(ctx, w):
+    return (ctx.rolling_kernel("high", w, "argmax") - ctx.rolling_kernel("low", w, "argmin")) / w
+
+@register_factor_family("rsv", ["high", "low", "close"])
+def _rsv(ctx, w):
+    shift = ctx.shift("close", w)
+    min = ctx["low"].where(ctx["low"] < shift, shift)
+    max = ctx["high"].where(ctx["high"] > shift, shift)
+    return (ctx["close"] - min) / (max - min + 1e-12)
+
+@register_factor_family("cntp", ["close"])
+def _cntp(ctx, w):
+    return ctx.rolling("ret1_gt0", w, "sum") / w
+
+@register_factor_family("cntn", ["close"])
+def _cntn(ctx, w):
+    return ctx.rolling("ret1_lt0", w, "sum") / w
+
+@register_factor_family("cntd", ["close"])
+def _cntd(ctx, w):
+    return ctx.factor("cntp_{}".format(w)) - ctx.factor("cntn_{}".format(w))
+
+# the original cal_factor passed the second rolling window as `pairwise`, so corr and cord
+# correlate the close (ratio) series with itself; the registry keeps those values
+@register_factor_family("corr", ["close"])
+def _corr(ctx, w):
+    return ctx.rolling("close", w, "corr", "close")
+
+@register_factor_family("cord", ["close"])
+def _cord(ctx, w):
+    return ctx.rolling("close_ratio", w, "corr", "close_ratio")
+
+@register_factor_family("sump", ["close"])
+def _sump(ctx, w):
+    return ctx.rolling("pos_ret1", w, "sum") / (ctx.rolling("abs_ret1", w, "sum") + 1e-12)
+
+@register_factor_family("sumn", ["close"])
+def _sumn(ctx, w):
+    return 1 - ctx.factor("sump_{}".format(w))
+
+@register_factor_family("sumd", ["close"])
+def _sumd(ctx, w):
+    return 2 * ctx.factor("sump_{}".format(w)) - 1
+
+@register_factor_family("vma", ["volume"])
+def _vma(ctx, w):
+    return ctx.rolling("volume", w, "mean") / (ctx["volume"] + 1e-12)
+
+@register_factor_family("vstd", ["volume"])
+def _vstd(ctx, w):
+    return ctx.rolling("volume", w, "std") / (ctx["volume"] + 1e-12)
+
+@register_factor_family("wvma", ["close", "volume"])
+def _wvma(ctx, w):
+    return ctx.rolling("wv", w, "std") / (ctx.rolling("wv", w, "mean") + 1e-12)
+
+@register_factor_family("vsump", ["volume"])
+def _vsump(ctx, w):
+    return ctx.rolling("pos_vchg1", w, "sum") / (ctx.rolling("abs_vchg1", w, "sum") + 1e-12)
+
+@register_factor_family("vsumn", ["volume"])
+def _vsumn(ctx, w):
+    return 1 - ctx.factor("vsump_{}".format(w))
+
+@register_factor_family("vsumd", ["volume"])
+def _vsumd(ctx, w):
+    return 2 * ctx.factor("vsump_{}".format(w)) - 1
+
+@register_factor("log_volume", ["volume"])
+def _log_volume_factor(ctx):
+    return ctx["log_volume"]
@@ -0,0 +1,175 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+TIMESTAMP_PARSERS = [pv.ISO8601, "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]
+
+def _source_columns(column_map, columns):
+    """Raw csv column names of the wanted (renamed) columns."""
+    inverse = {value: key for key, value in column_map.items()}
+    return [inverse.get(column, column) for column in columns]
+
+def _csv_options(include_columns, timestamp_column = None, parse_timestamp = True):
+    column_types = {}
+    if timestamp_column is not None:
+        column_types[timestamp_column] = pa.timestamp("ns") if parse_timestamp else pa.string()
+    read_options = pv.ReadOptions(use_threads=True)
+    # same as pd.read_csv: quoted newlines are allowed and empty strings are missing values
+    parse_options = pv.ParseOptions(newlines_in_values=True)
+    convert_options = pv.ConvertOptions(include_columns=include_columns,
+                                        column_types=column_types,
+                                        timestamp_parsers=TIMESTAMP_PARSERS,
+                                        strings_can_be_null=True)
+    return read_options, parse_options, convert_options
+
+def _page_paths(path):
+    """The raw page csv files a downloader wrote to {workdir}/{stock}/ next to {workdir}/{stock}.csv."""
+    page_dir = os.path.splitext(path)[0]
+    return sorted(glob.glob(os.path.join(page_dir, "*.csv")))
+
+def source_paths(path, from_pages = False):
+    """The files read for a raw source csv: its page csv files when from_pages and they exist, else the csv itself."""
+    pages = _page_paths(path) if from_pages else []
+    return pages if len(pages) > 0 else [path]
+
+def source_exists(path, from_pages = False):
+    return all([os.path.exists(source_path) for source_path in source_paths(path, from_pages)])
+
+def _unify_types(schemas):
+    """
+    Common type of the columns whose inferred type differs between the pages of a source: double
+    when every page is numeric (int64 and double pages), else text, as pd.read_csv of the merged
+    csv would read them.
+    """
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, set()).add(field.type)
+    unified = {}
+    for name, column_types in types.items():
+        if len(column_types) > 1:
+            numeric = all([pa.types.is_integer(type) or pa.types.is_floating(type) for type in column_types])
+            unified[name] = pa.float64() if numeric else pa.string()
+    return unified
+
+def _concat_pages(tables):
+    unified = _unify_types([table.schema for table in tables])
+    tables = [table.cast(pa.schema([pa.field(field.name, unified.get(field.name, field.type)) for field in table.schema]))
+              for table in tables]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+def _read_table(path, include_columns, timestamp_column, parse_timestamp, from_pages):
+    read_options, parse_options, convert_options = _csv_options(include_columns, timestamp_column, parse_timestamp)
+    pages = _page_paths(path) if from_pages else []
+    if len(pages) > 0:
+        tables = [pv.read_csv(page, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+                  for page in pages]
+        return _concat_pages(tables)
+    return pv.read_csv(path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+
+def read_source_csv(path,
+                    column_map = None,
+                    columns = None,
+                    start_date = None,
+                    end_date = None,
+                    from_pages = False):
+    """
+    Read a raw source csv with pyarrow's multi-threaded reader and return the frame of
+    `pd.read_csv(path).rename(columns=column_map)[columns]` with a parsed timestamp column,
+    restricted to start_date <= timestamp < end_date. Arrow's float parser may round a value
+    1 ulp away from pandas' one, so floats match pd.read_csv up to that (features computed from
+    them to about 1e-9), not bit for bit.
+
+    Only the columns in `columns` (after renaming, None for all) are read, the timestamps are
+    parsed by arrow and the date filter is applied before converting to pandas. Timestamps in
+    a format arrow does not parse are handed to pd.to_datetime instead.
+    With from_pages=True the page csv files the downloader wrote to {path without .csv}/ are
+    read and concatenated instead when they exist.
+    """
+    column_map = column_map if column_map else {}
+    include_columns = _source_columns(column_map, columns) if columns is not None else None
+    timestamp_column = _source_columns(column_map, ["timestamp"])[0]
+
+    try:
+        table = _read_table(path, include_columns, timestamp_column, True, from_pages)
+    except pa.ArrowInvalid:
+        table = _read_table(path, include_columns, timestamp_column, False, from_pages)
+
+    if pa.types.is_timestamp(table.schema.field(timestamp_column).type):
+        timestamp = table[timestamp_column]
+        if start_date is not None:
+            table = table.filter(pc.greater_equal(timestamp, pa.scalar(pd.Timestamp(start_date), type=timestamp.type)))
+            timestamp = table[timestamp_column]
+        if end_date is not None:
+            table = table.filter(pc.less(timestamp, pa.scalar(pd.Timestamp(end_date), type=timestamp.type)))
+        df = table.to_pandas()
+    else:
+        df = _filter_dates(table.to_pandas(), timestamp_column, start_date, end_date)
+
+    return _finish_frame(df, column_map, columns)
+
+def iter_source_csv(path,
+                    column_map = None,
+                    columns = None,
+                    start_date = None,
+                    end_date = None,
+                    chunk_size = 100000,
+                    from_pages = False):
+    """
+    Streaming variant of read_source_csv: yields the rows of the file in chunks of about
+    chunk_size rows (the last one may be smaller), in file order, with the same renaming,
+    column selection and date filter. Only one csv block is parsed at a time, so memory is
+    bounded by the chunk size and not by the length of the file. With from_pages=True the page
+    csv files are streamed one after another in name order.
+    """
+    column_map = column_map if column_map else {}
+    include_columns = _source_columns(column_map, columns) if columns is not None else None
+    timestamp_column = _source_columns(column_map, ["timestamp"])[0]
+
+    read_options, parse_options, convert_options = _csv_options(include_columns, timestamp_column, parse_timestamp=False)
+
+    paths = source_paths(path, from_pages)
+    if len(paths) > 1:
+        # the chunks go to one parquet schema, so the pages are read with their common types
+        unified = _unify_types([pv.open_csv(source_path, read_options=read_options, parse_options=parse_options,
+                                            convert_options=convert_options).schema for source_path in paths])
+        convert_options.column_types = dict(convert_options.column_types, **unified)
+
+    buffer, rows = [], 0
+    for source_path in paths:
+        reader = pv.open_csv(source_path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        for batch in reader:
+            df = _filter_dates(batch.to_pandas(), timestamp_column, start_date, end_date)
+            if len(df) == 0:
+                continue
+            buffer.append(df)
+            rows += len(df)
+            if rows >= chunk_size:
+                yield _finish_frame(pd.concat(buffer), column_map, columns)
+                buffer, rows = [], 0
+    if rows > 0:
+        yield _finish_frame(pd.concat(buffer), column_map, columns)
+
+def _filter_dates(df, timestamp_column, start_date = None, end_date = None):
+    df[timestamp_column] = pd.to_datetime(df[timestamp_column])
+    if start_date is not None:
+        df = df[df[timestamp_column] >= start_date]
+    if end_date is not None:
+        df = df[df[timestamp_column] < end_date]
+    return df
+
+def _finish_frame(df, column_map, columns):
+    # arrow gives None for missing strings where pd.read_csv gives nan
+    objects = df.columns[df.dtypes == object]
+    if len(objects) > 0:
+        df[objects] = df[objects].where(df[objects].notna(), np.nan)
+
+    df = df.rename(columns=column_map)
+    if columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True)
@@ -0,0 +1,57 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# The kernels roll along the first axis, so they accept a single series (n,) as well as a
+# panel (n, assets) where every column is rolled independently.
+
+def _windows(values, w):
+    """Return a (n - w + 1, ..., w) strided view of the trailing windows and a mask of the windows without nan."""
+    windows = sliding_window_view(values, w, axis=0)
+    valid = ~np.isnan(windows).any(axis=-1)
+    return windows, valid
+
+def _pad(values, shape, w):
+    """Left pad the per-window results with nan so they line up with the input rows."""
+    out = np.full(shape, np.nan, dtype=np.float64)
+    if shape[0] >= w:
+        out[w - 1:] = values
+    return out
+
+def rolling_rank(values, w):
+    """
+    Equivalent to `pd.Series(values).rolling(w).apply(my_rank)`, i.e. the percentile
+    rank (average method) of the last value inside each trailing window.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[0] < w:
+        return np.full(values.shape, np.nan, dtype=np.float64)
+
+    windows, valid = _windows(values, w)
+    last = windows[..., -1:]
+    less = (windows < last).sum(axis=-1)
+    equal = (windows == last).sum(axis=-1)
+
+    # average rank of the tied group, same arithmetic as pandas rank(method="average", pct=True)
+    rank = (less + (equal + 1) / 2) / w
+    rank = np.where(valid, rank, np.nan)
+    return _pad(rank, values.shape, w)
+
+def rolling_argmax(values, w):
+    """Equivalent to `pd.Series(values).rolling(w).apply(np.argmax)`."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[0] < w:
+        return np.full(values.shape, np.nan, dtype=np.float64)
+
+    windows, valid = _windows(values, w)
+    index = np.where(valid, windows.argmax(axis=-1), np.nan)
+    return _pad(index, values.shape, w)
+
+def rolling_argmin(values, w):
+    """Equivalent to `pd.Series(values).rolling(w).apply(np.argmin)`."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[0] < w:
+        return np.full(values.shape, np.nan, dtype=np.float64)
+
+    windows, valid = _windows(values, w)
+    index = np.where(valid, windows.argmin(axis=-1), np.nan)
+    return _pad(index, values.shape, w)
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+def file_sha256(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, "rb") as op:
+        for chunk in iter(lambda: op.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def code_version(paths):
+    """Hash of the given source files, changes whenever the processing code changes."""
+    sha = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as op:
+            sha.update(op.read())
+    return sha.hexdigest()[:16]
+
+class Manifest():
+    """
+    Records, for every output parquet, the content hash of its input csv files and the
+    parameters (date range, processor code version, options) it was built with, so stages
+    whose inputs have not changed can be skipped. The file lives at workdir/tag/manifest.json.
+
+    Hashes are only recomputed when the size or mtime of an input changes, so checking an
+    unchanged input costs one stat call.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.fingerprints = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf8") as op:
+                data = json.load(op)
+            self.entries = data.get("entries", {})
+            self.fingerprints = data.get("fingerprints", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as op:
+            json.dump(dict(entries=self.entries, fingerprints=self.fingerprints), op)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, path):
+        stat = os.stat(path)
+        cached = self.fingerprints.get(path)
+        if cached is not None and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        sha256 = file_sha256(path)
+        self.fingerprints[path] = dict(size=stat.st_size, mtime=stat.st_mtime_ns, sha256=sha256)
+        return sha256
+
+    def record(self, output, inputs, params):
+        """Build the entry of an output from the current state of its inputs."""
+        return dict(
+            inputs={path: self.fingerprint(path) for path in inputs},
+            params=params,
+        )
+
+    def is_fresh(self, output, inputs, params):
+        entry = self.entries.get(output)
+        if entry is None or not os.path.exists(output):
+            return False
+        if not all([os.path.exists(path) for path in inputs]):
+            return False
+        return entry == self.record(output, inputs, params)
+
+    def update(self, output, entry):
+        self.entries[output] = entry
@@ -1,41 +1,47 @@
 import multiprocessing
+import queue
+import hashlib
 from copy import deepcopy
+from functools import partial
 from datetime import datetime
 from finagent.registry import PROCESSOR
+from finagent.processor.factors import FactorContext, FACTOR_LOOKBACK, select_factors
+from finagent.processor.manifest import Manifest, code_version
+from finagent.processor.url_content import URLContentCache, URLContentFetcher
+from finagent.processor.ingest import read_source_csv, iter_source_csv, source_paths, source_exists
+from finagent.processor.dedup import MinHashDeduplicator
+from finagent.processor.scheduler import StageGraph
+from finagent.utils import format_dates
+from finagent.data.align import asof_join
+from finagent.data.partitioned import write_partitioned
 import os
 import pandas as pd
 import numpy as np
 from tqdm.auto import tqdm
-from langchain_community.document_loaders import PlaywrightURLLoader
-import backoff
 import time
 
-@backoff.on_exception(backoff.expo,(Exception,), max_tries=3, max_value=10, jitter=None)
-def langchain_parse_url(url):
-
-    print(">" * 30 + "Running langchain_parse_url" + ">" * 30)
-    start = time.time()
-    loader = PlaywrightURLLoader(urls = [url], remove_selectors=["header", "footer"])
-    data = loader.load()
-    if len(data) <= 0:
-        return None
-    content = data[0].page_content
-
-    if "Please enable cookies" in content:
-        return None
-    if "Please verify you are a human" in content:
-        return None
-    if "Checking if the site connection is secure" in content:
-        return None
-
-    print("url: {} | content: {}".format(url, content[:100].split("\n")))
-    end = time.time()
-    print(">" * 30 + "Time elapsed: {}s".format(end - start) + ">" * 30)
-    print("<" * 30 + "Finish langchain_parse_url" + "<" * 30)
-    return content
-
-def my_rank(x):
-   return pd.Series(x).rank(pct=True).iloc[-1]
+ECONOMIC_INDICATORS = [
+    "GDP",
+    "federalFunds",
+    "CPI",
+    "inflationRate",
+    "unemploymentRate",
+]
+
+# every module that shapes the outputs of the stages
+PROCESSOR_VERSION = code_version([
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), name) for name in [
+        "processor/processor.py",
+        "processor/factors.py",
+        "processor/kernels.py",
+        "processor/dedup.py",
+        "processor/ingest.py",
+        "processor/url_content.py",
+        "data/align.py",
+        "data/partitioned.py",
+        "utils/date_utils.py",
+    ]
+])
 
 def cal_news(df):
     df["title"] = df["title"].fillna("").str.replace("\n", " ").replace("\r", " ").replace("\t", " ")
@@ -58,132 +64,26 @@ def cal_sentiment(df, columns):
     return df
 
 
-def cal_factor(df, level="day"):
-    # intermediate values
-    df['max_oc'] = df[["open", "close"]].max(axis=1)
-    df['min_oc'] = df[["open", "close"]].min(axis=1)
-    df["kmid"] = (df["close"] - df["open"]) / df["close"]
-    df['kmid2'] = (df['close'] - df['open']) / (df['high'] - df['low'] + 1e-12)
-    df["klen"] = (df["high"] - df["low"]) / df["open"]
-    df['kup'] = (df['high'] - df['max_oc']) / df['open']
-    df['kup2'] = (df['high'] - df['max_oc']) / (df['high'] - df['low'] + 1e-12)
-    df['klow'] = (df['min_oc'] - df['low']) / df['open']
-    df['klow2'] = (df['min_oc'] - df['low']) / (df['high'] - df['low'] + 1e-12)
-    df["ksft"] = (2 * df["close"] - df["high"] - df["low"]) / df["open"]
-    df['ksft2'] = (2 * df['close'] - df['high'] - df['low']) / (df['high'] - df['low'] + 1e-12)
-    df.drop(columns=['max_oc', 'min_oc'], inplace=True)
+def cal_factor(df, level="day", engine="numpy", factors=None):
+    """
+    Compute the registered factors (finagent.processor.factors) of a price frame.
+    engine: "numpy" uses the sliding-window kernels for rank/imax/imin/imxd, "pandas" the original
+    rolling(w).apply implementation.
+    factors: factor names or family prefixes (e.g. ["ma", "std_20"]), None for all of them.
+    """
+    values = FactorContext(df, engine=engine).evaluate(factors)
+    df = pd.concat([df, pd.DataFrame(values, index=df.index)], axis=1)
 
-    window = [5, 10, 20, 30, 60]
-    for w in window:
-        df['roc_{}'.format(w)] = df['close'].shift(w) / df['close']
-
-    for w in window:
-        df['ma_{}'.format(w)] = df['close'].rolling(w).mean() / df['close']
-
-    for w in window:
-        df['std_{}'.format(w)] = df['close'].rolling(w).std() / df['close']
-
-    for w in window:
-        df['beta_{}'.format(w)] = (df['close'].shift(w) - df['close']) / (w * df['close'])
-
-    for w in window:
-        df['max_{}'.format(w)] = df['close'].rolling(w).max() / df['close']
-
-    for w in window:
-        df['min_{}'.format(w)] = df['close'].rolling(w).min() / df['close']
-
-    for w in window:
-        df['qtlu_{}'.format(w)] = df['close'].rolling(w).quantile(0.8) / df['close']
-
-    for w in window:
-        df['qtld_{}'.format(w)] = df['close'].rolling(w).quantile(0.2) / df['close']
-
-    for w in window:
-        df['rank_{}'.format(w)] = df['close'].rolling(w).apply(my_rank) / w
-
-    for w in window:
-        df['imax_{}'.format(w)] = df['high'].rolling(w).apply(np.argmax) / w
-
-    for w in window:
-        df['imin_{}'.format(w)] = df['low'].rolling(w).apply(np.argmin) / w
-
-    for w in window:
-        df['imxd_{}'.format(w)] = (df['high'].rolling(w).apply(np.argmax) - df['low'].rolling(w).apply(np.argmin)) / w
-
-    for w in window:
-        shift = df['close'].shift(w)
-        min = df["low"].where(df["low"] < shift, shift)
-        max = df["high"].where(df["high"] > shift, shift)
-        df["rsv_{}".format(w)] = (df["close"] - min) / (max - min + 1e-12)
-
-    df['ret1'] = df['close'].pct_change(1)
-    for w in window:
-        df['cntp_{}'.format(w)] = (df['ret1'].gt(0)).rolling(w).sum() / w
-
-    for w in window:
-        df['cntn_{}'.format(w)] = (df['ret1'].lt(0)).rolling(w).sum() / w
-
-    for w in window:
-        df['cntd_{}'.format(w)] = df['cntp_{}'.format(w)] - df['cntn_{}'.format(w)]
-
-    for w in window:
-        df1 = df["close"].rolling(w)
-        df2 = np.log(df["volume"] + 1).rolling(w)
-        df["corr_{}".format(w)] = df1.corr(pairwise = df2)
-
-    for w in window:
-        df1 = df["close"]
-        df_shift1 = df1.shift(1)
-        df2 = df["volume"]
-        df_shift2 = df2.shift(1)
-        df1 = df1 / df_shift1
-        df2 = np.log(df2 / df_shift2 + 1)
-        df["cord_{}".format(w)] = df1.rolling(w).corr(pairwise = df2.rolling(w))
-
-    df['abs_ret1'] = np.abs(df['ret1'])
-    df['pos_ret1'] = df['ret1']
-    df['pos_ret1'][df['pos_ret1'].lt(0)] = 0
-
-    for w in window:
-        df['sump_{}'.format(w)] = df['pos_ret1'].rolling(w).sum() / (df['abs_ret1'].rolling(w).sum() + 1e-12)
-
-    for w in window:
-        df['sumn_{}'.format(w)] = 1 - df['sump_{}'.format(w)]
-
-    for w in window:
-        df['sumd_{}'.format(w)] = 2 * df['sump_{}'.format(w)] - 1
-
-    for w in window:
-        df["vma_{}".format(w)] = df["volume"].rolling(w).mean() / (df["volume"] + 1e-12)
-
-    for w in window:
-        df["vstd_{}".format(w)] = df["volume"].rolling(w).std() / (df["volume"] + 1e-12)
-
-    for w in window:
-        shift = np.abs((df["close"] / df["close"].shift(1) - 1)) * df["volume"]
-        df1 = shift.rolling(w).std()
-        df2 = shift.rolling(w).mean()
-        df["wvma_{}".format(w)] = df1 / (df2 + 1e-12)
-
-    df['vchg1'] = df['volume'] - df['volume'].shift(1)
-    df['abs_vchg1'] = np.abs(df['vchg1'])
-    df['pos_vchg1'] = df['vchg1']
-    df['pos_vchg1'][df['pos_vchg1'].lt(0)] = 0
-
-    for w in window:
-        df["vsump_{}".format(w)] = df["pos_vchg1"].rolling(w).sum() / (df["abs_vchg1"].rolling(w).sum() + 1e-12)
-    for w in window:
-        df["vsumn_{}".format(w)] = 1 - df["vsump_{}".format(w)]
-    for w in window:
-        df["vsumd_{}".format(w)] = 2 * df["vsump_{}".format(w)] - 1
-
-    df["log_volume"] = np.log(df["volume"] + 1)
-
-    df.drop(columns=['ret1', 'abs_ret1', 'pos_ret1', 'vchg1', 'abs_vchg1', 'pos_vchg1', 'volume'], inplace=True)
+    df.drop(columns=['volume'], inplace=True)
 
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
     df = df.fillna(0)
 
+    df = cal_calendar(df, level=level)
+
+    return df
+
+def cal_calendar(df, level="day"):
     if level == "minute":
         df["minute"] = pd.to_datetime(df.index).minute
         df["hour"] = pd.to_datetime(df.index).hour
@@ -194,6 +94,29 @@ def cal_factor(df, level="day"):
 
     return df
 
+def cal_factor_panel(panel, engine="numpy", factors=None):
+    """
+    Panel version of cal_factor. panel maps open/high/low/close/volume to (bar x asset) frames
+    and every factor is computed for all assets at once, column by column. Returns an ordered
+    dict {factor name: (bar x asset) array}, before the inf/nan cleanup that cal_factor applies
+    to the whole frame.
+    """
+    values = FactorContext(panel, engine=engine).evaluate(factors)
+    return {name: np.asarray(value, dtype=np.float64) for name, value in values.items()}
+
+def cal_cross_sectional(factors, method="rank"):
+    """
+    Cross-sectional transform of a (date x asset) frame: per-day percentile rank or z-score
+    across the assets that have a value on that day.
+    """
+    factors = factors.replace([np.inf, -np.inf], np.nan)
+    if method == "rank":
+        return factors.rank(axis=1, pct=True)
+    elif method == "zscore":
+        return factors.sub(factors.mean(axis=1), axis=0).div(factors.std(axis=1) + 1e-12, axis=0)
+    else:
+        raise ValueError("Unknown cross-sectional method: {}".format(method))
+
 def cal_target(df):
     df['ret1'] = df['close'].pct_change(1).shift(-1)
     df['mov1'] = (df['ret1'] > 0)
@@ -211,7 +134,25 @@ class Processor():
                  interval="day",
                  if_parse_url = False,
                  workdir = None,
-                 tag = None
+                 tag = None,
+                 factor_engine = "numpy",
+                 factors = None,
+                 incremental = False,
+                 panel = False,
+                 panel_chunk_size = 200,
+                 cross_sectional_factors = None,
+                 save_long_format = False,
+                 use_manifest = True,
+                 url_cache_path = None,
+                 url_max_contexts = 4,
+                 url_concurrency = 8,
+                 url_error_ttl = 24 * 3600,
+                 read_pages = False,
+                 price_chunk_size = None,
+                 news_dedup_threshold = None,
+                 news_dedup_window = 1,
+                 stage_workers = None,
+                 save_partitioned = False
                  ):
         self.root = root
         self.path_params = path_params
@@ -222,6 +163,33 @@ class Processor():
         self.if_parse_url = if_parse_url
         self.workdir = workdir
         self.tag = tag
+        self.factor_engine = factor_engine
+        self.factors = factors
+        # incremental: only the factors of the bars after the stored features are computed, with the
+        # trailing FACTOR_LOOKBACK bars as context. Rolling aggregates then start from another bar
+        # than in a full recompute, so the appended rows match it up to float rounding (about
+        # 1e-10 relative), not bit for bit. Any change of the stored bars recomputes everything.
+        self.incremental = incremental
+        self.panel = panel
+        self.panel_chunk_size = panel_chunk_size
+        self.cross_sectional_factors = cross_sectional_factors if cross_sectional_factors else {}
+        self.save_long_format = save_long_format
+        if use_manifest:
+            self.manifest = Manifest(os.path.join(self.root, self.workdir, self.tag, "manifest.json"))
+        else:
+            self.manifest = None
+
+        self.url_cache_path = url_cache_path if url_cache_path else os.path.join(self.root, self.workdir, "url_cache.sqlite")
+        self.url_max_contexts = url_max_contexts
+        self.url_concurrency = url_concurrency
+        self.url_error_ttl = url_error_ttl
+        self.url_fetcher = None
+        self.read_pages = read_pages
+        self.price_chunk_size = price_chunk_size
+        self.news_dedup_threshold = news_dedup_threshold
+        self.news_dedup_window = news_dedup_window
+        self.stage_workers = stage_workers
+        self.save_partitioned = save_partitioned
 
         self.stocks = self._init_stocks()
 
@@ -230,15 +198,47 @@ class Processor():
             stocks = [line.strip() for line in op.readlines()]
         return stocks
 
-    def _process_price_and_features(self,
-                stocks = None,
-                start_date = None,
-                end_date = None):
-
+    def _get_url_fetcher(self):
+        if self.url_fetcher is None:
+            self.url_fetcher = URLContentFetcher(URLContentCache(self.url_cache_path),
+                                                 max_contexts=self.url_max_contexts,
+                                                 concurrency=self.url_concurrency,
+                                                 error_ttl=self.url_error_ttl)
+        return self.url_fetcher
+
+    def _url_contents(self, urls):
+        """Page text of each url, "" when the fetch failed so the row is not dropped as missing later."""
+        contents = self._get_url_fetcher().fetch_all(urls)
+        return [contents.get(url) or "" for url in urls]
+
+    def _collect_urls(self, stages, start_date = None, end_date = None):
+        """Urls inside the date range of the raw news/guidance csv files, {stage: stocks}."""
         start_date = datetime.strptime(start_date if start_date else self.start_date, "%Y-%m-%d")
         end_date = datetime.strptime(end_date if end_date else self.end_date, "%Y-%m-%d")
 
-        stocks = stocks if stocks else self.stocks
+        urls = []
+        for stage, stocks in stages.items():
+            for item in self.path_params.get(stage, []):
+                timestamp_column = "datetime" if stage == "news" and item["type"] == "yahoofinance" else "timestamp"
+                for stock in stocks:
+                    path = os.path.join(self.root, item["path"], "{}.csv".format(stock))
+                    if not source_exists(path, self.read_pages):
+                        continue
+                    df = read_source_csv(path, {timestamp_column: "timestamp"}, ["timestamp", "url"],
+                                         start_date=start_date, end_date=end_date, from_pages=self.read_pages)
+                    urls.extend(df["url"].tolist())
+        return list(dict.fromkeys(urls))
+
+    def _prefetch_urls(self, stages, start_date = None, end_date = None):
+        """Fetch the urls of all stocks and stages at once, so the stages only read the cache."""
+        if not self.if_parse_url:
+            return
+        urls = self._collect_urls(stages, start_date=start_date, end_date=end_date)
+        if len(urls) > 0:
+            self._url_contents(urls)
+
+    def _price_source(self, stock):
+        """Path, column map and (renamed) columns of the raw price csv of a stock."""
 
         price_columns = [
             "open",
@@ -249,63 +249,330 @@ class Processor():
             "adj_close"
         ]
 
-        for stock in tqdm(stocks):
-            price = self.path_params["prices"][0]
-            price_type = price["type"]
-            price_path = price["path"]
-
-            price_path = os.path.join(self.root, price_path, "{}.csv".format(stock))
-
-            if price_type == "fmp":
-                price_column_map = {
-                    "open": "open",
-                    "high": "high",
-                    "low": "low",
-                    "close": "close",
-                    "volume": "volume",
-                    "adjClose": "adj_close",
-                }
-            elif price_type == "yahoofinance":
-                price_column_map = {
-                    "Open": "open",
-                    "High": "high",
-                    "Low": "low",
-                    "Close": "close",
-                    "Volume": "volume",
-                    "Date": "timestamp",
-                    "Adj Close": "adj_close",
-                }
-            else:
-                price_column_map = {
-                    "open": "open",
-                    "high": "high",
-                    "low": "low",
-                    "close": "close",
-                    "volume": "volume",
-                    "adjClose": "adj_close",
-                }
+        price = self.path_params["prices"][0]
+        price_type = price["type"]
+        price_path = price["path"]
+
+        price_path = os.path.join(self.root, price_path, "{}.csv".format(stock))
+
+        if price_type == "fmp":
+            price_column_map = {
+                "open": "open",
+                "high": "high",
+                "low": "low",
+                "close": "close",
+                "volume": "volume",
+                "adjClose": "adj_close",
+            }
+        elif price_type == "yahoofinance":
+            price_column_map = {
+                "Open": "open",
+                "High": "high",
+                "Low": "low",
+                "Close": "close",
+                "Volume": "volume",
+                "Date": "timestamp",
+                "Adj Close": "adj_close",
+            }
+        else:
+            price_column_map = {
+                "open": "open",
+                "high": "high",
+                "low": "low",
+                "close": "close",
+                "volume": "volume",
+                "adjClose": "adj_close",
+            }
 
-            assert os.path.exists(price_path), "Price path {} does not exist".format(price_path)
-            price_df = pd.read_csv(price_path)
+        assert source_exists(price_path, self.read_pages), "Price path {} does not exist".format(price_path)
+        return price_path, price_column_map, ["timestamp"] + price_columns
 
-            price_df = price_df.rename(columns=price_column_map)[["timestamp"] + price_columns]
+    def _load_price(self, stock, start_date, end_date):
+        price_path, price_column_map, price_columns = self._price_source(stock)
+        price_df = read_source_csv(price_path, price_column_map, price_columns,
+                                   start_date=start_date, end_date=end_date, from_pages=self.read_pages)
 
-            price_df["timestamp"] = pd.to_datetime(price_df["timestamp"])
-            price_df = price_df[(price_df["timestamp"] >= start_date) & (price_df["timestamp"] < end_date)]
+        price_df = price_df.sort_values(by="timestamp")
+        price_df = price_df.drop_duplicates(subset=["timestamp"], keep="first")
+        price_df = price_df.reset_index(drop=True)
 
-            price_df = price_df.sort_values(by="timestamp")
-            price_df = price_df.drop_duplicates(subset=["timestamp"], keep="first")
-            price_df = price_df.reset_index(drop=True)
+        return price_df
+
+    def _process_price_and_features(self,
+                stocks = None,
+                start_date = None,
+                end_date = None):
+
+        start_date = datetime.strptime(start_date if start_date else self.start_date, "%Y-%m-%d")
+        end_date = datetime.strptime(end_date if end_date else self.end_date, "%Y-%m-%d")
+
+        stocks = stocks if stocks else self.stocks
+
+        for stock in tqdm(stocks):
+            price_df = self._load_price(stock, start_date, end_date)
 
             outpath = os.path.join(self.root, self.workdir, self.tag, "price")
             os.makedirs(outpath, exist_ok=True)
-            price_df.to_parquet(os.path.join(outpath, "{}.parquet".format(stock)), index=False)
+            price_path = os.path.join(outpath, "{}.parquet".format(stock))
+            # the bars the stored features were computed from, read before they are overwritten
+            previous_price_df = pd.read_parquet(price_path) if self.incremental and os.path.exists(price_path) else None
+            price_df.to_parquet(price_path, index=False)
 
-            features_df = cal_factor(deepcopy(price_df), level=self.interval)
-            features_df = cal_target(features_df)
             outpath = os.path.join(self.root, self.workdir, self.tag, "features")
             os.makedirs(outpath, exist_ok=True)
-            features_df.to_parquet(os.path.join(outpath, "{}.parquet".format(stock)), index=False)
+            features_path = os.path.join(outpath, "{}.parquet".format(stock))
+
+            features_df = None
+            if self.incremental and previous_price_df is not None and os.path.exists(features_path):
+                features_df = self._append_features(price_df, pd.read_parquet(features_path), previous_price_df)
+            if features_df is None:
+                features_df = cal_factor(deepcopy(price_df), level=self.interval, engine=self.factor_engine, factors=self.factors)
+                features_df = cal_target(features_df)
+            features_df.to_parquet(features_path, index=False)
+
+    def _load_price_chunks(self, stock, start_date, end_date):
+        """
+        Streaming variant of _load_price, yields the price bars in time-ordered chunks of about
+        price_chunk_size rows. The raw csv has to be sorted by time already, duplicated
+        timestamps are dropped like in _load_price.
+        """
+        price_path, price_column_map, price_columns = self._price_source(stock)
+
+        last_timestamp = None
+        for price_df in iter_source_csv(price_path, price_column_map, price_columns,
+                                        start_date=start_date, end_date=end_date, chunk_size=self.price_chunk_size,
+                                        from_pages=self.read_pages):
+            price_df = price_df.sort_values(by="timestamp", kind="stable")
+            price_df = price_df.drop_duplicates(subset=["timestamp"], keep="first")
+            if last_timestamp is not None:
+                if price_df["timestamp"].iloc[0] < last_timestamp:
+                    raise ValueError("Price path {} is not sorted by time, it can not be processed in chunks".format(price_path))
+                price_df = price_df[price_df["timestamp"] > last_timestamp]
+            if len(price_df) == 0:
+                continue
+            last_timestamp = price_df["timestamp"].iloc[-1]
+            yield price_df.reset_index(drop=True)
+
+    def _process_price_and_features_chunked(self,
+                stocks = None,
+                start_date = None,
+                end_date = None):
+        """
+        Out-of-core variant of _process_price_and_features for long (minute) histories. The bars
+        are streamed in chunks of price_chunk_size rows, the factors of every chunk are computed
+        with the trailing FACTOR_LOOKBACK bars of the previous chunk as context, and each chunk
+        is appended to the price and features parquet files as a row group. The last features
+        row of a chunk is held back until the next bar is known, since its target needs it.
+        Peak memory is bounded by the chunk size, the output matches the in-memory version.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        date_range = dict(start_date=start_date, end_date=end_date)
+        start_date = datetime.strptime(start_date if start_date else self.start_date, "%Y-%m-%d")
+        end_date = datetime.strptime(end_date if end_date else self.end_date, "%Y-%m-%d")
+
+        stocks = stocks if stocks else self.stocks
+
+        price_outpath = os.path.join(self.root, self.workdir, self.tag, "price")
+        features_outpath = os.path.join(self.root, self.workdir, self.tag, "features")
+        os.makedirs(price_outpath, exist_ok=True)
+        os.makedirs(features_outpath, exist_ok=True)
+
+        def write(writers, key, path, df):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if key not in writers:
+                writers[key] = pq.ParquetWriter(path + ".tmp", table.schema)
+            writers[key].write_table(table.cast(writers[key].schema))
+
+        for stock in tqdm(stocks):
+            price_path = os.path.join(price_outpath, "{}.parquet".format(stock))
+            features_path = os.path.join(features_outpath, "{}.parquet".format(stock))
+
+            writers = {}
+            context_df = None
+            pending_df = None
+            offset = 0
+            for price_df in self._load_price_chunks(stock, start_date, end_date):
+                write(writers, "price", price_path, price_df)
+
+                # global bar positions as index, as in the in-memory frame
+                price_df.index = pd.RangeIndex(offset, offset + len(price_df))
+                offset += len(price_df)
+
+                frame_df = price_df if context_df is None else pd.concat([context_df, price_df])
+                features_df = cal_factor(deepcopy(frame_df), level=self.interval, engine=self.factor_engine, factors=self.factors)
+                features_df = features_df.loc[price_df.index]
+                context_df = frame_df.iloc[-FACTOR_LOOKBACK:]
+
+                if pending_df is not None:
+                    features_df = pd.concat([pending_df, features_df])
+                features_df = cal_target(features_df)
+                pending_df = features_df.iloc[-1:].drop(columns=["ret1", "mov1"])
+                if len(features_df) > 1:
+                    write(writers, "features", features_path, features_df.iloc[:-1])
+
+            if pending_df is None:
+                # no bars in the date range, nothing to stream
+                self._process_price_and_features(stocks=[stock], **date_range)
+                continue
+
+            write(writers, "features", features_path, cal_target(pending_df))
+            for key, path in [("price", price_path), ("features", features_path)]:
+                writers[key].close()
+                os.replace(path + ".tmp", path)
+
+    def _process_price_and_features_panel(self,
+                stocks = None,
+                start_date = None,
+                end_date = None):
+        """
+        Panel variant of _process_price_and_features. The price frames of panel_chunk_size stocks
+        are stacked into (bar x asset) arrays aligned on each stock's bar position, so every
+        rolling factor sees exactly the bars it sees in cal_factor, and cal_factor_panel computes
+        all of them at once. Results are written to the usual features/{stock}.parquet files.
+
+        cross_sectional_factors, e.g. dict(rank=["roc_5"], zscore=["ma_20"]), adds per-day
+        cs_{method}_{factor} columns computed on the date-aligned values of the whole universe.
+        save_long_format additionally writes all stocks to features.parquet with a symbol column.
+        """
+
+        start_date = datetime.strptime(start_date if start_date else self.start_date, "%Y-%m-%d")
+        end_date = datetime.strptime(end_date if end_date else self.end_date, "%Y-%m-%d")
+
+        stocks = stocks if stocks else self.stocks
+
+        price_outpath = os.path.join(self.root, self.workdir, self.tag, "price")
+        features_outpath = os.path.join(self.root, self.workdir, self.tag, "features")
+        os.makedirs(price_outpath, exist_ok=True)
+        os.makedirs(features_outpath, exist_ok=True)
+
+        cross_sectional_names = sorted(set([name for names in self.cross_sectional_factors.values() for name in names]))
+        cross_sectional_values = {name: {} for name in cross_sectional_names}
+
+        for index in tqdm(range(0, len(stocks), self.panel_chunk_size)):
+            chunk = stocks[index: index + self.panel_chunk_size]
+
+            price_dfs = {}
+            for stock in chunk:
+                price_df = self._load_price(stock, start_date, end_date)
+                price_df.to_parquet(os.path.join(price_outpath, "{}.parquet".format(stock)), index=False)
+                price_dfs[stock] = price_df
+
+            length = max([len(price_df) for price_df in price_dfs.values()])
+            panel = {}
+            for key in ["open", "high", "low", "close", "volume"]:
+                values = np.full((length, len(chunk)), np.nan, dtype=np.float64)
+                for j, stock in enumerate(chunk):
+                    values[:len(price_dfs[stock]), j] = price_dfs[stock][key].values
+                panel[key] = pd.DataFrame(values, columns=chunk)
+
+            factors = cal_factor_panel(panel, engine=self.factor_engine, factors=self.factors)
+
+            for j, stock in enumerate(chunk):
+                price_df = price_dfs[stock]
+                n = len(price_df)
+
+                factors_df = pd.DataFrame(np.column_stack([value[:n, j] for value in factors.values()]),
+                                          columns=list(factors.keys()), index=price_df.index)
+                for name in cross_sectional_names:
+                    cross_sectional_values[name][stock] = pd.Series(factors[name][:n, j], index=price_df["timestamp"].values)
+
+                features_df = pd.concat([price_df, factors_df], axis=1).drop(columns=["volume"])
+                features_df.replace([np.inf, -np.inf], np.nan, inplace=True)
+                features_df = features_df.fillna(0)
+                features_df = cal_calendar(features_df, level=self.interval)
+                features_df = cal_target(features_df)
+                features_df.to_parquet(os.path.join(features_outpath, "{}.parquet".format(stock)), index=False)
+
+        if len(cross_sectional_names) > 0:
+            cross_sectional_dfs = {}
+            for method, names in self.cross_sectional_factors.items():
+                for name in names:
+                    cross_sectional_dfs["cs_{}_{}".format(method, name)] = cal_cross_sectional(
+                        pd.DataFrame(cross_sectional_values[name]), method=method)
+
+            for stock in stocks:
+                features_path = os.path.join(features_outpath, "{}.parquet".format(stock))
+                features_df = pd.read_parquet(features_path)
+                for column, cross_sectional_df in cross_sectional_dfs.items():
+                    features_df[column] = cross_sectional_df[stock].reindex(features_df["timestamp"].values).fillna(0).values
+                features_df.to_parquet(features_path, index=False)
+
+        if self.save_long_format:
+            self._save_long_format()
+
+    def _long_format_path(self):
+        return os.path.join(self.root, self.workdir, self.tag, "features.parquet")
+
+    def _save_long_format(self):
+        """
+        Write the features of every stock of the universe that has a features file to
+        features.parquet with a symbol column. It is rebuilt from the per-stock files in full, since
+        the price stage may only have recomputed the stale stocks.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        features_outpath = os.path.join(self.root, self.workdir, self.tag, "features")
+        path = self._long_format_path()
+
+        writer = None
+        for stock in self.stocks:
+            features_path = os.path.join(features_outpath, "{}.parquet".format(stock))
+            if not os.path.exists(features_path):
+                continue
+            features_df = pd.read_parquet(features_path)
+            features_df.insert(0, "symbol", stock)
+            table = pa.Table.from_pandas(features_df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path + ".tmp", table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+            os.replace(path + ".tmp", path)
+
+    def _feature_columns(self, price_df):
+        """Columns of the cal_factor + cal_target frame of price_df with the current factors selection."""
+        calendar = (["minute", "hour"] if self.interval == "minute" else []) + ["day", "weekday", "month"]
+        return [column for column in price_df.columns if column != "volume"] + \
+            select_factors(self.factors) + calendar + ["ret1", "mov1"]
+
+    def _append_features(self, price_df, features_df, previous_price_df):
+        """
+        Compute the factors of the bars after the last row of the existing features only, using the
+        trailing FACTOR_LOOKBACK bars as context, and append them. The target of the last existing
+        row depends on the next bar, so cal_target is applied again to the whole frame.
+        Returns None if the bars the existing features were computed from (previous_price_df, the
+        stored price parquet) are not exactly the first bars of price_df, i.e. history was revised or
+        the last bar was still forming, or if they were computed with another factors selection, so
+        the caller falls back to a full recompute.
+        """
+        n = len(features_df)
+        if n == 0 or n > len(price_df) or len(previous_price_df) != n:
+            return None
+        if list(features_df.columns) != self._feature_columns(price_df):
+            return None
+        if list(previous_price_df.columns) != list(price_df.columns):
+            return None
+        if not previous_price_df.reset_index(drop=True).equals(price_df.iloc[:n].reset_index(drop=True)):
+            return None
+        columns = [column for column in ["open", "high", "low", "close", "adj_close"] if column in price_df.columns]
+        if not (pd.to_datetime(features_df["timestamp"]).values == price_df["timestamp"].values[:n]).all():
+            return None
+        if not (features_df[columns].values == price_df[columns].values[:n]).all():
+            return None
+        if n == len(price_df):
+            return features_df
+
+        context_df = price_df.iloc[max(0, n - FACTOR_LOOKBACK):]
+        new_df = cal_factor(deepcopy(context_df), level=self.interval, engine=self.factor_engine, factors=self.factors)
+        new_df = new_df.iloc[n - context_df.index[0]:]
+
+        features_df = features_df.drop(columns=["ret1", "mov1"])
+        features_df = pd.concat([features_df, new_df[features_df.columns]], ignore_index=True)
+        features_df = cal_target(features_df)
+        return features_df
 
     def _process_guidance(self,
                           stocks = None,
@@ -342,13 +609,10 @@ class Processor():
                         "url": "url",
                     }
 
-                assert os.path.exists(guidance_path), "guidance path {} does not exist".format(guidance_path)
-
-                guidance_df = pd.read_csv(guidance_path)
-                guidance_df = guidance_df.rename(columns=guidance_column_map)[["timestamp"] + guidance_columns]
-                guidance_df["timestamp"] = pd.to_datetime(guidance_df["timestamp"])
+                assert source_exists(guidance_path, self.read_pages), "guidance path {} does not exist".format(guidance_path)
 
-                guidance_df = guidance_df[(guidance_df["timestamp"] >= start_date) & (guidance_df["timestamp"] < end_date)]
+                guidance_df = read_source_csv(guidance_path, guidance_column_map, ["timestamp"] + guidance_columns,
+                                              start_date=start_date, end_date=end_date, from_pages=self.read_pages)
                 guidance_df = guidance_df.sort_values(by="timestamp")
                 guidance_df = guidance_df.drop_duplicates(subset=["timestamp", "title", "text"], keep="first")
 
@@ -358,23 +622,17 @@ class Processor():
 
                 guidance_df = guidance_df.reset_index(drop=True)
                 guidance_df = cal_guidance(guidance_df)
-                guidance_df["timestamp"] = pd.to_datetime(guidance_df["timestamp"]).apply(lambda x: x.strftime("%Y-%m-%d"))
+                guidance_df["timestamp"] = format_dates(guidance_df["timestamp"])
                 guidances_df.append(guidance_df)
 
             guidances_df = pd.concat(guidances_df)
 
             if self.if_parse_url:
-                urls = guidances_df["url"].values
-                max_process = 10
-                pool = multiprocessing.Pool(processes=max_process)
-                contents = pool.map(langchain_parse_url, urls)
-                pool.close()
-                pool.join()
-                guidances_df["content"] = contents
+                guidances_df["content"] = self._url_contents(guidances_df["url"].values)
 
             guidances_df = guidances_df.sort_values(by="timestamp")
             guidances_df = guidances_df.reset_index(drop=True)
-            guidances_df = guidances_df[["timestamp", "type", "sentiment", "title", "text", "url"]]
+            guidances_df = guidances_df[["timestamp", "type", "sentiment", "title", "text", "url"] + (["content"] if self.if_parse_url else [])]
 
             outpath = os.path.join(self.root, self.workdir, self.tag, "guidance")
             os.makedirs(outpath, exist_ok=True)
@@ -397,6 +655,11 @@ class Processor():
             "url"
         ]
 
+        deduplicator = None
+        if self.news_dedup_threshold is not None:
+            deduplicator = MinHashDeduplicator(threshold=self.news_dedup_threshold, window=self.news_dedup_window)
+        removed = {}
+
         for stock in tqdm(stocks):
 
             newses = self.path_params["news"]
@@ -431,13 +694,10 @@ class Processor():
                         "url": "url",
                     }
 
-                assert os.path.exists(news_path), "News path {} does not exist".format(news_path)
-
-                news_df = pd.read_csv(news_path)
-                news_df = news_df.rename(columns=news_column_map)[["timestamp"] + news_columns]
-                news_df["timestamp"] = pd.to_datetime(news_df["timestamp"])
+                assert source_exists(news_path, self.read_pages), "News path {} does not exist".format(news_path)
 
-                news_df = news_df[(news_df["timestamp"] >= start_date) & (news_df["timestamp"] < end_date)]
+                news_df = read_source_csv(news_path, news_column_map, ["timestamp"] + news_columns,
+                                          start_date=start_date, end_date=end_date, from_pages=self.read_pages)
                 news_df = news_df.sort_values(by="timestamp")
                 news_df = news_df.drop_duplicates(subset=["timestamp", "title", "text"], keep="first")
 
@@ -448,29 +708,34 @@ class Processor():
 
                 news_df = news_df.reset_index(drop=True)
                 news_df = cal_news(news_df)
-                news_df["timestamp"] = pd.to_datetime(news_df["timestamp"]).apply(lambda x: x.strftime("%Y-%m-%d"))
+                news_df["timestamp"] = format_dates(news_df["timestamp"])
                 newses_df.append(news_df)
 
             newses_df = pd.concat(newses_df)
 
             if self.if_parse_url:
-                urls = newses_df["url"].values
-                max_process = 10
-                pool = multiprocessing.Pool(processes=max_process)
-                contents = pool.map(langchain_parse_url, urls)
-                pool.close()
-                pool.join()
-                newses_df["content"] = contents
+                newses_df["content"] = self._url_contents(newses_df["url"].values)
 
             newses_df = newses_df.sort_values(by="timestamp")
             newses_df = newses_df.drop_duplicates(subset=["timestamp", "title"], keep="first")
             newses_df = newses_df.reset_index(drop=True)
-            newses_df = newses_df[["timestamp", "type", "source", "title", "text", "url"]]
+
+            if deduplicator is not None:
+                days = pd.to_datetime(newses_df["timestamp"]).values.astype("datetime64[D]").astype(np.int64)
+                mask = deduplicator.duplicates((newses_df["title"] + " " + newses_df["text"]).tolist(), days)
+                print("| Processor news: {} removed {} near-duplicates of {} rows".format(stock, mask.sum(), len(newses_df)))
+                removed[stock] = int(mask.sum())
+                newses_df = newses_df[~mask].reset_index(drop=True)
+            newses_df = newses_df[["timestamp", "type", "source", "title", "text", "url"] + (["content"] if self.if_parse_url else [])]
 
             outpath = os.path.join(self.root, self.workdir, self.tag, "news")
             os.makedirs(outpath, exist_ok=True)
             newses_df.to_parquet(os.path.join(outpath, "{}.parquet".format(stock)), index=False)
 
+        if deduplicator is not None:
+            print("| Processor news: removed {} near-duplicates in {} stocks".format(sum(removed.values()), len(removed)))
+        return removed
+
     def _process_sentiment(self,
                            stocks = None,
                            start_date = None,
@@ -510,15 +775,12 @@ class Processor():
                 if sentiment_type == "fmp":
                     sentiment_column_map = {}
 
-                assert os.path.exists(sentiment_path), "sentiment path {} does not exist".format(sentiment_path)
+                assert source_exists(sentiment_path, self.read_pages), "sentiment path {} does not exist".format(sentiment_path)
 
-                sentiment_df = pd.read_csv(sentiment_path)
-                sentiment_df = sentiment_df.rename(columns=sentiment_column_map)[["timestamp"] + sentiment_columns]
-                sentiment_df["timestamp"] = pd.to_datetime(sentiment_df["timestamp"])
-
-                sentiment_df = sentiment_df[ (sentiment_df["timestamp"] >= start_date) & (sentiment_df["timestamp"] < end_date)]
+                sentiment_df = read_source_csv(sentiment_path, sentiment_column_map, ["timestamp"] + sentiment_columns,
+                                               start_date=start_date, end_date=end_date, from_pages=self.read_pages)
                 sentiment_df = sentiment_df.sort_values(by="timestamp")
-                sentiment_df["timestamp"] = pd.to_datetime(sentiment_df["timestamp"]).apply(lambda x: x.strftime("%Y-%m-%d"))
+                sentiment_df["timestamp"] = format_dates(sentiment_df["timestamp"])
 
                 if sentiment_type == "rapidapi_seekingalpha":
                     sentiment_df["type"] = "rapidapi"
@@ -527,19 +789,12 @@ class Processor():
                 sentiment_df = cal_sentiment(sentiment_df, sentiment_columns)
                 sentiment_df = sentiment_df.drop_duplicates(subset=["timestamp"], keep="first")
                 sentiment_df = sentiment_df.reset_index(drop=True)
-                sentiment_df["timestamp"] = pd.to_datetime(sentiment_df["timestamp"]).apply(lambda x: x.strftime("%Y-%m-%d"))
                 sentiments_df.append(sentiment_df)
 
             sentiments_df = pd.concat(sentiments_df)
 
-            if self.if_parse_url:
-                urls = sentiments_df["url"].values
-                max_process = 10
-                pool = multiprocessing.Pool(processes=max_process)
-                contents = pool.map(langchain_parse_url, urls)
-                pool.close()
-                pool.join()
-                sentiments_df["content"] = contents
+            if self.if_parse_url and "url" in sentiments_df.columns:
+                sentiments_df["content"] = self._url_contents(sentiments_df["url"].values)
 
             sentiments_df["type"] = "sentiment"
 
@@ -563,74 +818,440 @@ class Processor():
         GDP, realGDP, nominalPotentialGDP, realGDPPerCapita, federalFunds, CPI, inflationRate, inflation, retailSales, consumerSentiment, durableGoods, unemploymentRate, totalNonfarmPayroll, initialClaims, industrialProductionTotalIndex, newPrivatelyOwnedHousingUnitsStartedTotalUnits, totalVehicleSales, retailMoneyFunds, smoothedUSRecessionProbabilities, 3MonthOr90DayRatesAndYieldsCertificatesOfDeposit, commercialBankInterestRateOnCreditCardPlansAllAccounts, 30YearFixedRateMortgageAverage, 15YearFixedRateMortgageAverage
         """
 
-        indicators = [
-            "GDP",
-            "federalFunds",
-            "CPI",
-            "inflationRate",
-            "unemploymentRate",
-        ]
+        indicators = ECONOMIC_INDICATORS
 
         type = self.path_params["economic"][0]["type"]
         path = self.path_params["economic"][0]["path"]
 
-        df = None
+        indicator_dfs = []
 
         for indicator in indicators:
 
             indicator_path = os.path.join(self.root, path, "{}.csv".format(indicator))
             assert os.path.exists(indicator_path), "indicator path {} does not exist".format(indicator_path)
 
-            indicator_df = pd.read_csv(indicator_path)
-
-            indicator_df = indicator_df.rename(columns={
+            indicator_df = read_source_csv(indicator_path, {
                 "GDP": "gdp",
                 "federalFunds": "federal_funds",
                 "CPI": "cpi",
                 "inflationRate": "inflation_rate",
                 "unemploymentRate": "unemployment_rate",
-            })
-
-            indicator_df["timestamp"] = pd.to_datetime(indicator_df["timestamp"])
-            indicator_df = indicator_df[(indicator_df["timestamp"] >= start_date) & (indicator_df["timestamp"] < end_date)]
+            }, start_date=start_date, end_date=end_date)
             indicator_df = indicator_df.sort_values(by="timestamp")
+            indicator_dfs.append(indicator_df)
 
-            if df is None:
-                df = indicator_df
-            else:
-                df = pd.merge(df, indicator_df, on="timestamp", how="left")
+        # every indicator as known on each release date of any indicator, instead of sampling
+        # them on the exact dates of the first one
+        calendar = np.unique(np.concatenate([indicator_df["timestamp"].values for indicator_df in indicator_dfs]))
+        df = pd.DataFrame({"timestamp": calendar})
+        for indicator_df in indicator_dfs:
+            values = asof_join(calendar, indicator_df)
+            for column in values.columns:
+                df[column] = values[column].values
 
-            df = df.fillna(method="ffill")
-            df = df.fillna(method="bfill")
-            df = df.reset_index(drop=True)
-            df["type"] = "economic"
+        df = df.fillna(method="bfill")
+        df = df.reset_index(drop=True)
+        df["type"] = "economic"
 
         df.to_parquet(os.path.join(self.root, self.workdir, self.tag, "economic.parquet"), index=False)
 
-    def process(self,
-                stocks = None,
-                start_date = None,
-                end_date = None):
+    def _stages(self):
+        return [stage for stage in ["price", "guidance", "sentiment", "news"] if stage == "price" or stage in self.path_params]
 
-        print(">" * 30 + "Running price and features..." + ">" * 30)
-        self._process_price_and_features(stocks=stocks, start_date=start_date, end_date=end_date)
-        print("<" * 30 + "Finish price and features..." + "<" * 30)
+    def _stage_paths(self, stock):
+        """
+        Input csv files (the page csv files with read_pages) and output parquet files of the
+        per-stock stages, used to decide whether a stock is up to date.
+        """
+        outdir = os.path.join(self.root, self.workdir, self.tag)
 
-        if "guidance" in self.path_params:
-            print(">" * 30 + "Running guidance..." + ">" * 30)
-            self._process_guidance(stocks=stocks, start_date=start_date, end_date=end_date)
-            print("<" * 30 + "Finish guidance..." + "<" * 30)
+        stages = {}
+
+        price_path = os.path.join(self.root, self.path_params["prices"][0]["path"], "{}.csv".format(stock))
+        stages["price"] = dict(
+            inputs=source_paths(price_path, self.read_pages),
+            outputs=[os.path.join(outdir, "price", "{}.parquet".format(stock)),
+                     os.path.join(outdir, "features", "{}.parquet".format(stock))]
+        )
+
+        for stage in ["guidance", "sentiment", "news"]:
+            if stage not in self.path_params:
+                continue
+            stages[stage] = dict(
+                inputs=[path for item in self.path_params[stage]
+                        for path in source_paths(os.path.join(self.root, item["path"], "{}.csv".format(stock)), self.read_pages)],
+                outputs=[os.path.join(outdir, stage, "{}.parquet".format(stock))]
+            )
 
-        if "sentiment" in self.path_params:
-            print(">" * 30 + "Running sentiment..." + ">" * 30)
+        return stages
+
+    def _economic_paths(self):
+        path = self.path_params["economic"][0]["path"]
+        return dict(
+            inputs=[os.path.join(self.root, path, "{}.csv".format(indicator)) for indicator in ECONOMIC_INDICATORS],
+            outputs=[os.path.join(self.root, self.workdir, self.tag, "economic.parquet")]
+        )
+
+    def _stage_params(self, stage, start_date = None, end_date = None):
+        """Everything besides the input files that an output of the stage depends on."""
+        params = dict(
+            start_date=start_date if start_date else self.start_date,
+            end_date=end_date if end_date else self.end_date,
+            version=PROCESSOR_VERSION,
+        )
+        if self.save_partitioned and stage != "economic":
+            params.update(save_partitioned=True)
+        if self.read_pages and stage != "economic":
+            params.update(read_pages=True)
+        if stage == "price":
+            params.update(
+                interval=self.interval,
+                factor_engine=self.factor_engine,
+                factors=select_factors(self.factors),
+                panel=self.panel,
+                cross_sectional_factors={key: list(value) for key, value in self.cross_sectional_factors.items()},
+            )
+            if self.panel and self.cross_sectional_factors:
+                # cross-sectional columns depend on the whole universe
+                params["universe"] = hashlib.sha256("\n".join(sorted(self.stocks)).encode()).hexdigest()[:16]
+        elif stage in ["guidance", "sentiment", "news"]:
+            params.update(if_parse_url=self.if_parse_url)
+            if stage == "news" and self.news_dedup_threshold is not None:
+                params.update(news_dedup_threshold=self.news_dedup_threshold,
+                              news_dedup_window=self.news_dedup_window)
+        return params
+
+    def _stale_stocks(self, stage, stocks, start_date = None, end_date = None, force = False):
+        """Stocks whose outputs of the stage are not fresh in the manifest, all of them with force."""
+        if self.manifest is None or force:
+            return stocks
+        params = self._stage_params(stage, start_date=start_date, end_date=end_date)
+        stale = []
+        for stock in stocks:
+            paths = self._stage_paths(stock)[stage]
+            if not all([self.manifest.is_fresh(output, paths["inputs"], params) for output in paths["outputs"]]):
+                stale.append(stock)
+        if stage == "price" and "universe" in params and len(stale) > 0:
+            return stocks
+        if stage == "price" and self.panel and self.save_long_format and not os.path.exists(self._long_format_path()):
+            return stocks
+        return stale
+
+    def _stage_records(self, stage, stocks, start_date = None, end_date = None):
+        """(output, manifest entry, input fingerprints) of the outputs the stage has just written."""
+        records = []
+        if self.manifest is None:
+            return records
+        params = self._stage_params(stage, start_date=start_date, end_date=end_date)
+        for stock in stocks:
+            paths = self._stage_paths(stock)[stage]
+            for output in paths["outputs"]:
+                entry = self.manifest.record(output, paths["inputs"], params)
+                fingerprints = {path: self.manifest.fingerprints[path] for path in paths["inputs"]}
+                records.append((output, entry, fingerprints))
+        return records
+
+    def _commit_records(self, records, save = True):
+        if self.manifest is None:
+            return
+        for output, entry, fingerprints in records:
+            self.manifest.fingerprints.update(fingerprints)
+            self.manifest.update(output, entry)
+        if save:
+            self.manifest.save()
+
+    def is_up_to_date(self, stock):
+        stages = self._stage_paths(stock)
+        if self.manifest is not None:
+            return all([len(self._stale_stocks(stage, [stock])) == 0 for stage in stages])
+        for stage in stages.values():
+            if not all([os.path.exists(path) for path in stage["inputs"] + stage["outputs"]]):
+                return False
+            input_mtime = max([os.path.getmtime(path) for path in stage["inputs"]])
+            output_mtime = min([os.path.getmtime(path) for path in stage["outputs"]])
+            if output_mtime < input_mtime:
+                return False
+        return True
+
+    def _process_stage(self,
+                       stage,
+                       stocks = None,
+                       start_date = None,
+                       end_date = None):
+        print(">" * 30 + "Running {}...".format(stage) + ">" * 30)
+        if stage == "price":
+            if self.panel:
+                self._process_price_and_features_panel(stocks=stocks, start_date=start_date, end_date=end_date)
+            elif self.price_chunk_size:
+                self._process_price_and_features_chunked(stocks=stocks, start_date=start_date, end_date=end_date)
+            else:
+                self._process_price_and_features(stocks=stocks, start_date=start_date, end_date=end_date)
+        elif stage == "guidance":
+            self._process_guidance(stocks=stocks, start_date=start_date, end_date=end_date)
+        elif stage == "sentiment":
             self._process_sentiment(stocks=stocks, start_date=start_date, end_date=end_date)
-            print("<" * 30 + "Finish sentiment..." + "<" * 30)
+        elif stage == "news":
+            self._process_news(stocks=stocks, start_date=start_date, end_date=end_date)
+        if self.save_partitioned:
+            self._save_partitioned(stage, stocks=stocks)
+        print("<" * 30 + "Finish {}...".format(stage) + "<" * 30)
 
-        print(">" * 30 + "Running news..." + ">" * 30)
-        self._process_news(stocks=stocks, start_date=start_date, end_date=end_date)
-        print("<" * 30 + "Finish news..." + "<" * 30)
+    def _save_partitioned(self, stage, stocks = None):
+        """
+        Copy the per-stock outputs of a stage into the hive-partitioned dataset at
+        workdir/tag/dataset (source=price|features|guidance|sentiment|news/asset=/year=), which
+        Dataset(partitioned_path=...) reads with date-range pushdown.
+        """
+        stocks = stocks if stocks else self.stocks
+        path = os.path.join(self.root, self.workdir, self.tag, "dataset")
+        for stock in stocks:
+            for output in self._stage_paths(stock)[stage]["outputs"]:
+                source = os.path.basename(os.path.dirname(output))
+                write_partitioned(path, source, stock, pd.read_parquet(output))
+
+    def _process_stocks(self,
+                        stocks = None,
+                        start_date = None,
+                        end_date = None,
+                        stages = None,
+                        commit = True,
+                        force = False):
+        """
+        Run the per-stock stages, skipping stocks whose outputs are fresh in the manifest unless force.
+        With commit=False the manifest records are returned instead of written (worker processes).
+        """
+
+        stocks = stocks if stocks else self.stocks
+        stages = stages if stages is not None else self._stages()
+
+        stale_stocks = {stage: self._stale_stocks(stage, stocks, start_date=start_date, end_date=end_date, force=force)
+                        for stage in stages}
+        self._prefetch_urls({stage: stale_stocks[stage] for stage in ["guidance", "news"] if stage in stale_stocks},
+                            start_date=start_date, end_date=end_date)
+
+        records = []
+        for stage in stages:
+            stale = stale_stocks[stage]
+            if len(stale) == 0:
+                print("| Processor {}: {} stocks up to date, skipped".format(stage, len(stocks)))
+                continue
+            self._process_stage(stage, stocks=stale, start_date=start_date, end_date=end_date)
+            stage_records = self._stage_records(stage, stale, start_date=start_date, end_date=end_date)
+            if commit:
+                self._commit_records(stage_records)
+            records.extend(stage_records)
+
+        return records
+
+    def _economic_is_fresh(self, start_date = None, end_date = None, force = False):
+        if self.manifest is None or force:
+            return False
+        paths = self._economic_paths()
+        params = self._stage_params("economic", start_date=start_date, end_date=end_date)
+        return self.manifest.is_fresh(paths["outputs"][0], paths["inputs"], params)
+
+    def _economic_records(self, start_date = None, end_date = None):
+        if self.manifest is None:
+            return []
+        paths = self._economic_paths()
+        params = self._stage_params("economic", start_date=start_date, end_date=end_date)
+        entry = self.manifest.record(paths["outputs"][0], paths["inputs"], params)
+        fingerprints = {path: self.manifest.fingerprints[path] for path in paths["inputs"]}
+        return [(paths["outputs"][0], entry, fingerprints)]
+
+    def _process_economics(self,
+                           start_date = None,
+                           end_date = None,
+                           force = False):
+        if "economic" not in self.path_params:
+            return
+
+        if self._economic_is_fresh(start_date=start_date, end_date=end_date, force=force):
+            print("| Processor economic: up to date, skipped")
+            return
+
+        print(">" * 30 + "Running economic..." + ">" * 30)
+        self._process_economic(start_date=start_date, end_date=end_date)
+        print("<" * 30 + "Finish economic..." + "<" * 30)
+
+        self._commit_records(self._economic_records(start_date=start_date, end_date=end_date))
+
+    def _stage_graph(self,
+                     stocks = None,
+                     start_date = None,
+                     end_date = None):
+        """
+        The stages of process() as a StageGraph: url prefetching, the per-stock stages and the
+        economic stage. Only the guidance and news stages depend on the prefetched urls, every
+        other stage is independent. Fresh stages are left out. Returns the graph and the
+        on_done callback that writes the manifest records of a finished stage.
+        """
+        stocks = stocks if stocks else self.stocks
+
+        graph = StageGraph()
+
+        stale_stocks = {}
+        for stage in self._stages():
+            stale_stocks[stage] = self._stale_stocks(stage, stocks, start_date=start_date, end_date=end_date)
+            if len(stale_stocks[stage]) == 0:
+                print("| Processor {}: {} stocks up to date, skipped".format(stage, len(stocks)))
+
+        url_stages = {stage: stale_stocks[stage] for stage in ["guidance", "news"]
+                      if len(stale_stocks.get(stage, [])) > 0}
+        if self.if_parse_url and len(url_stages) > 0:
+            self._get_url_fetcher()
+            graph.add("urls", partial(self._prefetch_urls, url_stages, start_date=start_date, end_date=end_date))
+
+        for stage, stale in stale_stocks.items():
+            if len(stale) == 0:
+                continue
+            graph.add(stage, partial(self._process_stage, stage, stocks=stale, start_date=start_date, end_date=end_date),
+                      deps=["urls"] if stage in url_stages and "urls" in graph.stages else None)
 
         if "economic" in self.path_params:
-            print(">" * 30 + "Running economic..." + ">" * 30)
-            self._process_economic(stocks=stocks, start_date=start_date, end_date=end_date)
-            print("<" * 30 + "Finish economic..." + "<" * 30)
\ No newline at end of file
+            if self._economic_is_fresh(start_date=start_date, end_date=end_date):
+                print("| Processor economic: up to date, skipped")
+            else:
+                graph.add("economic", partial(self._process_economic, start_date=start_date, end_date=end_date))
+
+        def on_done(stage, result):
+            if stage == "economic":
+                self._commit_records(self._economic_records(start_date=start_date, end_date=end_date))
+            elif stage in stale_stocks:
+                self._commit_records(self._stage_records(stage, stale_stocks[stage], start_date=start_date, end_date=end_date))
+
+        return graph, on_done
+
+    def process(self,
+                stocks = None,
+                start_date = None,
+                end_date = None):
+        """
+        Run all stages, independent stages concurrently on up to stage_workers threads
+        (stage_workers=1 runs them one after another), and print a per-stage timing summary.
+        """
+
+        try:
+            graph, on_done = self._stage_graph(stocks=stocks, start_date=start_date, end_date=end_date)
+            graph.run(max_workers=self.stage_workers, on_done=on_done)
+            self._commit_records([])
+        finally:
+            self.close()
+
+    def close(self):
+        if self.url_fetcher is not None:
+            self.url_fetcher.close()
+
+    def process_parallel(self,
+                         stocks = None,
+                         start_date = None,
+                         end_date = None,
+                         workers = None,
+                         resume = True):
+        """
+        Process the per-stock stages with a bounded pool of worker processes pulling one stock
+        at a time from a queue, then the economic stage once. The workers send their manifest
+        records back and only this process writes the manifest. resume=False reprocesses every
+        stock and the economic stage even when the manifest marks them fresh.
+        Returns {stock: {"status": "done" | "skipped" | "failed", "time": seconds, "error": str}}.
+        """
+
+        stocks = stocks if stocks else self.stocks
+        workers = workers if workers else multiprocessing.cpu_count()
+
+        start = time.time()
+        results = {}
+        jobs = []
+        for stock in stocks:
+            if resume and self.is_up_to_date(stock):
+                results[stock] = dict(status="skipped", time=0.0, error=None)
+            else:
+                jobs.append(stock)
+
+        print("| Processor total stocks: {}, skipped: {}, to process: {}, workers: {}".format(
+            len(stocks), len(stocks) - len(jobs), len(jobs), min(workers, len(jobs))))
+
+        stages = self._stages()
+        if len(jobs) > 0 and self.panel:
+            # the panel engine needs the whole universe in one process, the workers skip the price stage;
+            # cross-sectional factors are always computed over all stocks
+            self._process_stocks(stocks=stocks if self.cross_sectional_factors else jobs,
+                                 start_date=start_date, end_date=end_date, stages=["price"], force=not resume)
+            stages = [stage for stage in stages if stage != "price"]
+
+        if len(jobs) > 0:
+            # one browser pool in this process for the urls of every stock, the workers hit the cache
+            self._prefetch_urls({stage: jobs for stage in ["guidance", "news"] if stage in stages},
+                                start_date=start_date, end_date=end_date)
+
+            job_queue = multiprocessing.Queue()
+            result_queue = multiprocessing.Queue()
+            for stock in jobs:
+                job_queue.put(stock)
+
+            pool = []
+            for _ in range(min(workers, len(jobs))):
+                job_queue.put(None)
+                worker = StockProcessorWorker(self, job_queue, result_queue, start_date, end_date, stages, force=not resume)
+                worker.start()
+                pool.append(worker)
+
+            while len(results) < len(stocks):
+                try:
+                    stock, status, elapsed, error, records = result_queue.get(timeout=1)
+                except queue.Empty:
+                    if not any([worker.is_alive() for worker in pool]):
+                        break
+                    continue
+                results[stock] = dict(status=status, time=elapsed, error=error)
+                self._commit_records(records, save=len(results) % 100 == 0)
+                print("| Processor [{}/{}] {}: {} in {:.2f}s{}".format(
+                    len(results), len(stocks), stock, status, elapsed,
+                    "" if error is None else " | {}".format(error)))
+
+            for worker in pool:
+                worker.join()
+
+            for stock in jobs:
+                if stock not in results:
+                    results[stock] = dict(status="failed", time=0.0, error="worker exited unexpectedly")
+
+        self._process_economics(start_date=start_date, end_date=end_date, force=not resume)
+        self._commit_records([])
+        self.close()
+
+        failed = [stock for stock in stocks if results[stock]["status"] == "failed"]
+        print("| Processor done: {}, skipped: {}, failed: {}, time: {:.2f}s".format(
+            len([stock for stock in stocks if results[stock]["status"] == "done"]),
+            len([stock for stock in stocks if results[stock]["status"] == "skipped"]),
+            len(failed),
+            time.time() - start))
+        if len(failed) > 0:
+            print("| Processor failed stocks: {}".format(", ".join(failed)))
+
+        return results
+
+class StockProcessorWorker(multiprocessing.Process):
+    def __init__(self, processor, jobs, results, start_date = None, end_date = None, stages = None, force = False):
+        super().__init__()
+        self.processor = processor
+        self.jobs = jobs
+        self.results = results
+        self.start_date = start_date
+        self.end_date = end_date
+        self.stages = stages
+        self.force = force
+
+    def run(self):
+        while True:
+            stock = self.jobs.get()
+            if stock is None:
+                break
+            start = time.time()
+            try:
+                records = self.processor._process_stocks(stocks=[stock], start_date=self.start_date, end_date=self.end_date,
+                                                         stages=self.stages, commit=False, force=self.force)
+                self.results.put((stock, "done", time.time() - start, None, records))
+            except Exception as e:
+                self.results.put((stock, "failed", time.time() - start, repr(e), []))
+        self.processor.close()
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class StageGraph():
+    """
+    A small DAG executor for processing stages. Every stage whose dependencies are done is
+    submitted to a thread pool, so I/O-bound stages (csv reading, url fetching) overlap with
+    the CPU-bound ones (numpy/pandas/arrow release the GIL in their heavy loops).
+
+    on_done(name, result) is called in the thread that calls run(), so callers can keep
+    shared state such as the manifest single-threaded. When a stage fails its dependents are
+    not run, the other stages finish and the first error is raised at the end.
+    """
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, fn, deps = None):
+        self.stages[name] = dict(fn=fn, deps=list(deps) if deps else [])
+        return self
+
+    def _validate(self):
+        for name, stage in self.stages.items():
+            for dep in stage["deps"]:
+                assert dep in self.stages, "Stage {} depends on unknown stage {}".format(name, dep)
+        visiting, visited = set(), set()
+        def visit(name):
+            if name in visited:
+                return
+            assert name not in visiting, "Stage graph has a cycle through {}".format(name)
+            visiting.add(name)
+            for dep in self.stages[name]["deps"]:
+                visit(dep)
+            visiting.remove(name)
+            visited.add(name)
+        for name in self.stages:
+            visit(name)
+
+    def run(self, max_workers = None, on_done = None):
+        """Returns {name: {"status": "done" | "failed" | "skipped", "start": s, "time": s}}."""
+        self._validate()
+        if len(self.stages) == 0:
+            return {}
+
+        start = time.time()
+        timings = {}
+        errors = []
+        pending = dict(self.stages)
+        running = {}
+
+        def timed(name, fn):
+            stage_start = time.time()
+            try:
+                return fn()
+            finally:
+                timings[name] = dict(start=stage_start - start, time=time.time() - stage_start)
+
+        with ThreadPoolExecutor(max_workers=max_workers if max_workers else max(len(self.stages), 1)) as executor:
+            while len(pending) > 0 or len(running) > 0:
+                for name in list(pending):
+                    deps = pending[name]["deps"]
+                    if any([timings.get(dep, {}).get("status") in ["failed", "skipped"] for dep in deps]):
+                        timings[name] = dict(status="skipped", start=None, time=0.0)
+                        del pending[name]
+                    elif all([timings.get(dep, {}).get("status") == "done" for dep in deps]):
+                        running[executor.submit(timed, name, pending[name]["fn"])] = name
+                        del pending[name]
+
+                if len(running) == 0:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                        if on_done is not None:
+                            on_done(name, result)
+                        timings[name]["status"] = "done"
+                    except Exception as e:
+                        timings[name]["status"] = "failed"
+                        errors.append(e)
+
+        timings = {name: timings[name] for name in self.stages}
+        print("| Processor stage timing, total {:.2f}s:".format(time.time() - start))
+        for name, timing in timings.items():
+            if timing["start"] is None:
+                print("|   {}: {}".format(name, timing["status"]))
+            else:
+                print("|   {}: {} in {:.2f}s, started at +{:.2f}s".format(name, timing["status"], timing["time"], timing["start"]))
+
+        if len(errors) > 0:
+            raise errors[0]
+        return timings
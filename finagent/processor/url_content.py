@@ -0,0 +1,227 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+BLOCKED_MARKERS = [
+    "Please enable cookies",
+    "Please verify you are a human",
+    "Checking if the site connection is secure",
+]
+
+class URLContentCache():
+    """
+    On-disk url -> (status, content) cache backed by sqlite, so it can be shared by the worker
+    processes of Processor.process_parallel and by different workdir tags.
+    status is one of "ok", "empty", "blocked" or "error"; content is None unless status is "ok".
+    get_many also returns when each url was fetched, so failed fetches can expire.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS contents ("
+                               "url TEXT PRIMARY KEY, status TEXT, content TEXT, fetched_at REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def get_many(self, urls):
+        results = {}
+        urls = list(urls)
+        with self._connect() as connection:
+            for index in range(0, len(urls), 500):
+                batch = urls[index: index + 500]
+                rows = connection.execute("SELECT url, status, content, fetched_at FROM contents WHERE url IN ({})".format(
+                    ",".join(["?"] * len(batch))), batch).fetchall()
+                for url, status, content, fetched_at in rows:
+                    results[url] = (status, content, fetched_at)
+        return results
+
+    def put_many(self, items):
+        """items: {url: (status, content)}"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO contents (url, status, content, fetched_at) VALUES (?, ?, ?, ?)",
+                                   [(url, status, content, now) for url, (status, content) in items.items()])
+
+class BrowserPool():
+    """One headless chromium with a fixed number of reusable browser contexts."""
+    def __init__(self, max_contexts=4, headless=True, proxy=None):
+        self.max_contexts = max_contexts
+        self.headless = headless
+        self.proxy = proxy
+        self.playwright = None
+        self.browser = None
+        self.contexts = None
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless, proxy=self.proxy)
+        self.contexts = asyncio.Queue()
+        for _ in range(self.max_contexts):
+            self.contexts.put_nowait(await self.browser.new_context())
+
+    async def acquire(self):
+        return await self.contexts.get()
+
+    def release(self, context):
+        self.contexts.put_nowait(context)
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
+
+class URLContentFetcher():
+    """
+    Fetches the text of urls with a long-lived BrowserPool running on a background event loop.
+    fetch_all deduplicates the urls, answers what it can from the cache and fetches the rest
+    concurrently (at most `concurrency` pages at a time), then stores every result in the cache.
+    The text is extracted like langchain's PlaywrightURLLoader did before (unstructured html
+    partitioning with header and footer removed).
+
+    Urls whose fetch failed are cached as "error" too, so a dead link is not loaded again by every
+    stage and worker, but only for error_ttl seconds (a day by default): after a transient outage
+    they are fetched again by a later run. error_ttl=None keeps errors for good. "ok", "empty" and
+    "blocked" results are kept for good.
+    """
+    def __init__(self,
+                 cache,
+                 max_contexts=4,
+                 concurrency=8,
+                 max_tries=3,
+                 timeout=30,
+                 remove_selectors=("header", "footer"),
+                 error_ttl=24 * 3600,
+                 headless=True,
+                 proxy=None):
+        self.cache = cache
+        self.max_contexts = max_contexts
+        self.concurrency = concurrency
+        self.max_tries = max_tries
+        self.timeout = timeout
+        self.remove_selectors = list(remove_selectors)
+        self.error_ttl = error_ttl
+        self.headless = headless
+        self.proxy = proxy
+
+        self.pid = None
+        self.loop = None
+        self.thread = None
+        self.pool = None
+        self.pool_lock = None
+
+    def __getstate__(self):
+        # the event loop and the browser belong to the process that started them
+        state = self.__dict__.copy()
+        state.update(loop=None, thread=None, pool=None, pool_lock=None)
+        return state
+
+    def _run(self, coroutine):
+        if self.loop is not None and self.pid != os.getpid():
+            # forked from the process that owns the loop
+            self.loop, self.thread, self.pool, self.pool_lock = None, None, None, None
+        if self.loop is None:
+            self.pid = os.getpid()
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _ensure_pool(self):
+        # the pool is only published once it has started, concurrent callers wait on the lock
+        if self.pool_lock is None:
+            self.pool_lock = asyncio.Lock()
+        async with self.pool_lock:
+            if self.pool is None:
+                pool = BrowserPool(max_contexts=self.max_contexts, headless=self.headless, proxy=self.proxy)
+                await pool.start()
+                self.pool = pool
+        return self.pool
+
+    async def _evaluate(self, page):
+        from unstructured.partition.html import partition_html
+
+        for selector in self.remove_selectors:
+            for element in await page.locator(selector).all():
+                if await element.is_visible():
+                    await element.evaluate("element => element.remove()")
+
+        elements = partition_html(text=await page.content())
+        return "\n\n".join([str(element) for element in elements])
+
+    async def _fetch_one(self, pool, semaphore, url):
+        async with semaphore:
+            for tries in range(self.max_tries):
+                if tries > 0:
+                    await asyncio.sleep(min(2 ** (tries - 1), 10))
+                context = await pool.acquire()
+                page = None
+                try:
+                    page = await context.new_page()
+                    response = await page.goto(url, timeout=self.timeout * 1000)
+                    if response is None:
+                        raise ValueError("page.goto() returned None for url {}".format(url))
+                    content = await self._evaluate(page)
+                    if len(content) == 0:
+                        return "empty", None
+                    if any([marker in content for marker in BLOCKED_MARKERS]):
+                        return "blocked", None
+                    return "ok", content
+                except Exception as e:
+                    error = e
+                finally:
+                    if page is not None:
+                        try:
+                            await page.close()
+                        except Exception:
+                            pass
+                    pool.release(context)
+            print("url: {} | error: {}".format(url, error))
+            return "error", None
+
+    async def _fetch_many(self, urls):
+        pool = await self._ensure_pool()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*[self._fetch_one(pool, semaphore, url) for url in urls])
+        return dict(zip(urls, results))
+
+    def fetch_all(self, urls):
+        """Returns {url: content or None} for the unique urls."""
+        urls = [url for url in dict.fromkeys(urls) if isinstance(url, str) and len(url) > 0]
+
+        cached = self.cache.get_many(urls)
+        if self.error_ttl is not None:
+            now = time.time()
+            cached = {url: value for url, value in cached.items()
+                      if value[0] != "error" or now - value[2] < self.error_ttl}
+        missing = [url for url in urls if url not in cached]
+
+        if len(missing) > 0:
+            print(">" * 30 + "Fetching {} urls ({} cached)".format(len(missing), len(cached)) + ">" * 30)
+            start = time.time()
+            fetched = self._run(self._fetch_many(missing))
+            self.cache.put_many(fetched)
+            cached.update(fetched)
+            print("<" * 30 + "Fetched {} urls in {:.2f}s".format(len(missing), time.time() - start) + "<" * 30)
+
+        return {url: cached[url][1] for url in urls}
+
+    def close(self):
+        if self.loop is None or self.pid != os.getpid():
+            return
+        if self.pool is not None:
+            self._run(self.pool.close())
+            self.pool = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.thread = None
@@ -3,6 +3,7 @@ from .helper import content_replace
 from .helper import text_replace
 from .helper import str2html
 from .custom import Prompt
+from .context import StateContext, ParamsContext, additions
 from .helper import prepared_tools_params
 from .helper import prepare_latest_market_intelligence_params
 from .helper import prepare_low_level_reflection_params
@@ -0,0 +1,61 @@
+from collections.abc import Mapping
+
+class StateContext(Mapping):
+    """
+    Read-only view of an environment state shared by the stages of a step. The frames are not
+    copied: stages read them and derive new frames (filters, reset_index, ...) but must not
+    modify them in place. Keys cannot be added or replaced.
+    """
+    def __init__(self, state):
+        self._state = state._state if isinstance(state, StateContext) else state
+
+    def __getitem__(self, key):
+        return self._state[key]
+
+    def __iter__(self):
+        return iter(self._state)
+
+    def __len__(self):
+        return len(self._state)
+
+    def __repr__(self):
+        return "StateContext({})".format(list(self._state.keys()))
+
+class ParamsContext(dict):
+    """
+    Copy-on-write params of a stage. A context starts from its parent's params without copying
+    their values (only the key table is copied), records the keys the stage sets as its
+    additions and leaves the parent untouched. The values are shared with the parent, a stage
+    sets new values instead of changing them in place. It is a dict, so it renders, saves and
+    goes to memory as the params dicts did.
+    """
+    def __init__(self, params = None, **kwargs):
+        super(ParamsContext, self).__init__(params if params is not None else {})
+        self.added = set()
+        self.update(kwargs)
+
+    def __setitem__(self, key, value):
+        self.added.add(key)
+        super(ParamsContext, self).__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def additions(self):
+        """{key: value} set by this stage."""
+        return {key: self[key] for key in self.added if key in self}
+
+def additions(params):
+    """
+    What a stage hands back to the pipeline: the additions of a ParamsContext, or every key of a
+    plain dict (e.g. params loaded from a saved result).
+    """
+    if isinstance(params, ParamsContext):
+        return params.additions()
+    return params
@@ -2,9 +2,9 @@ import json
 from typing import Dict, Any
 from bs4 import BeautifulSoup,Tag
 import pandas as pd
-from copy import deepcopy
 import math
 from finagent.memory import MemoryInterface
+from finagent.prompt.context import ParamsContext
 from finagent.provider import EmbeddingProvider
 from finagent.query import DiverseQuery, extract_query_type
 from finagent.tools import StrategyAgents
@@ -105,13 +105,13 @@ def prepared_tools_params(state: Dict,
                           mode= "valid"
                           ):
 
-    price = deepcopy(state["price"])
-    news = deepcopy(state["news"])
-    guidance = deepcopy(state["guidance"])
-    sentiment = deepcopy(state["sentiment"])
-    economic = deepcopy(state["economic"])
+    price = state["price"]
+    news = state["news"]
+    guidance = state["guidance"]
+    sentiment = state["sentiment"]
+    economic = state["economic"]
 
-    res_params = deepcopy(params)
+    res_params = ParamsContext(params)
 
     date = info["date"]
 
@@ -253,7 +253,7 @@ def prepare_latest_market_intelligence_params(state: Dict,
                                             diverse_query: DiverseQuery = None
                                             ):
 
-    res_params = deepcopy(params)
+    res_params = ParamsContext(params)
 
     latest_market_intelligence_query = params["latest_market_intelligence_query"]
 
@@ -327,7 +327,7 @@ def prepare_low_level_reflection_params(state: Dict,
                                         provider: EmbeddingProvider = None,
                                         diverse_query: DiverseQuery = None
                                         ):
-    res_params = deepcopy(params)
+    res_params = ParamsContext(params)
 
     low_level_reflection_query = params["low_level_reflection_query"]
     low_level_reflection_reasoning = params["low_level_reflection_reasoning"]
@@ -392,7 +392,7 @@ def prepare_high_level_reflection_params(state: Dict,
                                          provider: EmbeddingProvider = None,
                                          diverse_query: DiverseQuery = None
                                          ):
-    res_params = deepcopy(params)
+    res_params = ParamsContext(params)
 
     date = info["date"]
 
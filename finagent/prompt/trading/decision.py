@@ -1,11 +1,11 @@
 import os
 from typing import Dict, List, Any
 import pandas as pd
-from copy import deepcopy
 import backoff
 
 from finagent.registry import PROMPT
 from finagent.prompt import Prompt
+from finagent.prompt.context import ParamsContext, additions
 from finagent.memory import MemoryInterface
 from finagent.provider import EmbeddingProvider
 from finagent.utils import init_path, save_html, save_json, load_json
@@ -37,7 +37,7 @@ class DecisionTrading(Prompt):
                 return "0%"
 
 
-        res_params = deepcopy(params)
+        res_params = ParamsContext(params)
 
         asset_price = info["price"]
         asset_cash = info["cash"]
@@ -136,7 +136,7 @@ class DecisionTrading(Prompt):
             reasoning = res["response_dict"]["reasoning"]
             action = res["response_dict"]["action"]
 
-        params.update(task_params)
+        params.update(additions(task_params))
 
         params.update({
             "decision_reasoning": reasoning,
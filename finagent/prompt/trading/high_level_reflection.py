@@ -6,6 +6,7 @@ import backoff
 
 from finagent.registry import PROMPT
 from finagent.prompt import Prompt
+from finagent.prompt.context import ParamsContext, additions
 from finagent.memory import MemoryInterface
 from finagent.provider import EmbeddingProvider
 from finagent.utils import init_path, save_html, save_json, load_json
@@ -30,7 +31,7 @@ class HighLevelReflectionTrading(Prompt):
                          provider: EmbeddingProvider = None,
                          diverse_query: DiverseQuery = None) -> Dict:
 
-        res_params = deepcopy(params)
+        res_params = ParamsContext(params)
 
         date = info["date"]
         previous_date = params["previous_date"]
@@ -84,12 +85,12 @@ class HighLevelReflectionTrading(Prompt):
                       provider: EmbeddingProvider = None) -> None:
         symbol = info["symbol"]
 
-        data = deepcopy(res["params"])
+        data = ParamsContext(res["params"])
 
         response_dict = deepcopy(res["response_dict"])
 
         embedding_text = response_dict["query"]
-        embedding = provider.embed_query(embedding_text)
+        embedding = provider.embed_documents([embedding_text])[0]
 
         data.update({
             "embedding_text": embedding_text,
@@ -100,10 +101,10 @@ class HighLevelReflectionTrading(Prompt):
             "query": response_dict["query"],
         })
 
-        memory.add_memory(type="high_level_reflection",
-                          symbol=symbol,
-                          data=data,
-                          embedding_key="embedding")
+        memory.add_memories(type="high_level_reflection",
+                            symbol=symbol,
+                            datas=[data],
+                            embedding_key="embedding")
 
     def run(self,
             state: Dict,
@@ -165,7 +166,7 @@ class HighLevelReflectionTrading(Prompt):
             summary = res["response_dict"]["summary"]
             query = res["response_dict"]["query"]
 
-        params.update(task_params)
+        params.update(additions(task_params))
 
         params.update({
             "high_level_reasoning": reasoning,
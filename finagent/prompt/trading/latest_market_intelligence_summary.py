@@ -6,6 +6,7 @@ from copy import deepcopy
 
 from finagent.registry import PROMPT
 from finagent.prompt import Prompt
+from finagent.prompt.context import ParamsContext, additions
 from finagent.asset import ASSET
 from finagent.memory import MemoryInterface
 from finagent.provider import EmbeddingProvider
@@ -13,6 +14,7 @@ from finagent.query import DiverseQuery
 from finagent.utils import init_path
 from finagent.utils import save_html
 from finagent.utils import save_json, load_json
+from finagent.utils import format_news_id
 
 @PROMPT.register_module(force=True)
 class LatestMarketIntelligenceSummaryTrading(Prompt):
@@ -30,7 +32,7 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
                             memory: MemoryInterface,
                             provider: EmbeddingProvider,
                             diverse_query: DiverseQuery = None) -> Dict:
-        res_params = deepcopy(params)
+        res_params = ParamsContext(params)
 
         asset_info = ASSET.get_asset_info(info["symbol"])
 
@@ -43,8 +45,8 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
         asset_type = info["asset_type"]
         current_date = info["date"]
 
-        price = deepcopy(state["price"])
-        news = deepcopy(state["news"])
+        price = state["price"]
+        news = state["news"]
 
         price = price[price.index == current_date]
         news = news[news.index == current_date]
@@ -71,7 +73,7 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
 
             for row in news.iterrows():
                 row = row[1]
-                id = row["id"]
+                id = format_news_id(row["id"])
                 title = row["title"]
                 text = row["text"]
 
@@ -132,8 +134,8 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
         current_date = info["date"]
         stock_symbol = info["symbol"]
         
-        price = deepcopy(state["price"])
-        news = deepcopy(state["news"])
+        price = state["price"]
+        news = state["news"]
 
         price = price[price.index == current_date]
         news = news[news.index == current_date]
@@ -151,19 +153,18 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
             close = math.nan
             adj_close = math.nan
 
+        datas = []
         for row in news.iterrows():
             date = row[0] if isinstance(row[0], str) else row[0].strftime("%Y-%m-%d")
             row = row[1]
 
-            id = row["id"]
+            id = format_news_id(row["id"])
             title = row["title"]
             text = row["text"]
 
             embedding_text = f"Heading: {title}\n" + \
                              f"Content: {text}\n"
 
-            embedding = provider.embed_query(embedding_text)
-
             data = {
                 "date": date,
                 "id": id,
@@ -177,13 +178,21 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
                 "query": response_dict["query"],
                 "summary": response_dict["summary"],
                 "embedding_text": embedding_text,
-                "embedding": embedding,
             }
+            datas.append(data)
+
+        if len(datas) == 0:
+            return
+
+        # one embedding request for the whole day, the provider splits it by its chunk size
+        embeddings = provider.embed_documents([data["embedding_text"] for data in datas])
+        for data, embedding in zip(datas, embeddings):
+            data["embedding"] = embedding
 
-            memory.add_memory(type="market_intelligence",
-                              symbol=stock_symbol,
-                              data=data,
-                              embedding_key="embedding")
+        memory.add_memories(type="market_intelligence",
+                            symbol=stock_symbol,
+                            datas=datas,
+                            embedding_key="embedding")
 
     def run(self,
             state: Dict,
@@ -242,7 +251,7 @@ class LatestMarketIntelligenceSummaryTrading(Prompt):
             query = res["response_dict"]["query"]
             summary = res["response_dict"]["summary"]
 
-        params.update(task_params)
+        params.update(additions(task_params))
 
         params.update({
             "latest_market_intelligence_query": query,
@@ -6,6 +6,7 @@ import backoff
 
 from finagent.registry import PROMPT
 from finagent.prompt import Prompt
+from finagent.prompt.context import ParamsContext, additions
 from finagent.memory import MemoryInterface
 from finagent.provider import EmbeddingProvider
 from finagent.query import DiverseQuery
@@ -51,7 +52,6 @@ class LowLevelReflectionTrading(Prompt):
                 return "unknown"
             
         price = state["price"]
-        price = deepcopy(price)
         price = price.reset_index(drop=False)
         price = price[["timestamp", "adj_close"]]
         price = price.dropna(axis=0, how="any")
@@ -99,7 +99,7 @@ class LowLevelReflectionTrading(Prompt):
                          provider: EmbeddingProvider = None,
                          diverse_query: DiverseQuery = None) -> Dict:
 
-        res_params = deepcopy(params)
+        res_params = ParamsContext(params)
 
         current_date = info["date"]
         price_movement = self._convert_to_price_movement(state, current_date=current_date)
@@ -135,11 +135,11 @@ class LowLevelReflectionTrading(Prompt):
                      provider: EmbeddingProvider = None) -> None:
         symbol = info["symbol"]
 
-        data = deepcopy(res["params"])
+        data = ParamsContext(res["params"])
         response_dict = deepcopy(res["response_dict"])
 
         embedding_text = response_dict["query"]
-        embedding = provider.embed_query(embedding_text)
+        embedding = provider.embed_documents([embedding_text])[0]
 
         data.update({
             "embedding_text": embedding_text,
@@ -148,10 +148,10 @@ class LowLevelReflectionTrading(Prompt):
             "query": response_dict["query"],
         })
 
-        memory.add_memory(type="low_level_reflection",
-                          symbol=symbol,
-                          data=data,
-                          embedding_key="embedding")
+        memory.add_memories(type="low_level_reflection",
+                            symbol=symbol,
+                            datas=[data],
+                            embedding_key="embedding")
 
     def run(self,
             state: Dict,
@@ -208,7 +208,7 @@ class LowLevelReflectionTrading(Prompt):
             reasoning = res["response_dict"]["reasoning"]
             query = res["response_dict"]["query"]
 
-        params.update(task_params)
+        params.update(additions(task_params))
 
         params.update({
             "low_level_reflection_reasoning": reasoning,
@@ -2,10 +2,10 @@ import math
 import os
 import backoff
 from typing import Dict, List, Any
-from copy import deepcopy
 
 from finagent.registry import PROMPT
 from finagent.prompt import Prompt
+from finagent.prompt.context import ParamsContext, additions
 from finagent.asset import ASSET
 from finagent.memory import MemoryInterface
 from finagent.provider import EmbeddingProvider
@@ -29,7 +29,7 @@ class PastMarketIntelligenceSummaryTrading(Prompt):
                             memory: MemoryInterface,
                             provider: EmbeddingProvider,
                             diverse_query: DiverseQuery = None) -> Dict:
-        res_params = deepcopy(params)
+        res_params = ParamsContext(params)
         return res_params
 
 
@@ -113,7 +113,7 @@ class PastMarketIntelligenceSummaryTrading(Prompt):
             res_html = res["res_html"]
             summary = res["response_dict"]["summary"]
 
-        params.update(task_params)
+        params.update(additions(task_params))
 
         params.update({
             "past_market_intelligence_summary": summary,
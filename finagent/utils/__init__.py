@@ -5,3 +5,6 @@ from .file_utils import read_resource_file
 from .singleton import Singleton
 from .file_utils import init_path
 from .file_utils import save_html
+from .date_utils import normalize_dates, format_dates
+from .format_utils import format_news_id
+from .record_utils import TradingRecordStore
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+def normalize_dates(values):
+    """
+    Vectorized replacement of `pd.to_datetime(x.strftime("%Y-%m-%d"))` applied row by row:
+    parse the timestamps and truncate them to midnight. Timezone-aware timestamps keep their
+    local date and lose the timezone, as the strftime round trip did.
+    """
+    timestamps = pd.to_datetime(values)
+    if isinstance(timestamps, pd.Series):
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        return timestamps.dt.normalize()
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_localize(None)
+    return timestamps.normalize()
+
+def format_dates(values):
+    """Vectorized replacement of `pd.to_datetime(x).strftime("%Y-%m-%d")` applied row by row."""
+    timestamps = normalize_dates(values)
+    days = np.asarray(timestamps, dtype="datetime64[ns]").astype("datetime64[D]")
+    dates = np.datetime_as_string(days, unit="D").astype(object)
+    if isinstance(timestamps, pd.Series):
+        return pd.Series(dates, index=timestamps.index, name=timestamps.name)
+    return dates
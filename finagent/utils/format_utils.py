@@ -0,0 +1,7 @@
+NEWS_ID_WIDTH = 6
+
+def format_news_id(id):
+    """Zero-padded news id as shown in the prompts, ids already formatted are returned as they are."""
+    if isinstance(id, str):
+        return id
+    return "{:0{}d}".format(int(id), NEWS_ID_WIDTH)
@@ -0,0 +1,97 @@
+import os
+import glob
+import json
+import shutil
+import pyarrow as pa
+
+class TradingRecordStore():
+    """
+    Append-only columnar log of the trading records dict of lists. Every key is a column of JSON
+    encoded values, null where a row has no value for the key, so the lists may have different
+    lengths. Each checkpoint appends the values added to the lists since the previous one as
+    one record batch to an Arrow IPC stream, so a step costs the same however long the run is.
+
+    Every process writes its own stream segment path/part-{n}.arrows, to_dict reads them all
+    back in order (a segment cut short by a crash is read up to its last complete batch).
+    Values are appended as they are at the checkpoint, later edits of logged values are not seen.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.sink = None
+        self.keys = None
+        self.lengths = {}
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.arrows")))
+
+    def _read_segment(self, segment):
+        batches = []
+        with pa.OSFile(segment, "rb") as source:
+            try:
+                reader = pa.ipc.open_stream(source)
+                while True:
+                    batches.append(reader.read_next_batch())
+            except (StopIteration, pa.ArrowInvalid, OSError):
+                pass
+        return batches
+
+    def to_dict(self):
+        """The trading records dict of lists of everything logged so far."""
+        self.flush()
+        records = {}
+        for segment in self._segments():
+            for batch in self._read_segment(segment):
+                for key, column in zip(batch.schema.names, batch.columns):
+                    values = records.setdefault(key, [])
+                    values.extend([json.loads(value) for value in column.to_pylist() if value is not None])
+        return records
+
+    def reset(self, records):
+        """Drop the log and start it again with the current records."""
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.lengths = {}
+        self.checkpoint(records)
+
+    def _open(self, keys):
+        os.makedirs(self.path, exist_ok=True)
+        segment = os.path.join(self.path, "part-{:05d}.arrows".format(len(self._segments())))
+        self.keys = list(keys)
+        self.schema = pa.schema([(key, pa.string()) for key in self.keys])
+        self.sink = pa.OSFile(segment, "wb")
+        self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def checkpoint(self, records):
+        """Append the values added to records since the last checkpoint, one row per new value of a list."""
+        new_values = {key: values[self.lengths.get(key, 0):] for key, values in records.items()}
+        num_rows = max([len(values) for values in new_values.values()] + [0])
+        if num_rows == 0:
+            return
+
+        if self.writer is None:
+            self._open(records.keys())
+        unknown = [key for key in records if key not in self.keys]
+        if len(unknown) > 0:
+            raise ValueError("trading record keys {} are not in the log {}".format(unknown, self.keys))
+
+        columns = []
+        for key in self.keys:
+            values = [json.dumps(value) for value in new_values.get(key, [])]
+            columns.append(pa.array(values + [None] * (num_rows - len(values)), type=pa.string()))
+        self.writer.write_batch(pa.record_batch(columns, schema=self.schema))
+        self.sink.flush()
+
+        for key, values in records.items():
+            self.lengths[key] = len(values)
+
+    def flush(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+        self.writer = None
+        self.sink = None
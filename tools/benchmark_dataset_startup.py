@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.data import Dataset
+from finagent.utils import normalize_dates
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Dataset startup on a synthetic news table")
+    parser.add_argument("--rows", type=int, default=1000000, help="total number of news rows")
+    parser.add_argument("--assets", type=int, default=10)
+    parser.add_argument("--workdir", type=str, default=None, help="where to write the synthetic dataset, default a temp dir")
+    args = parser.parse_args()
+    return args
+
+def legacy_normalize_dates(values):
+    timestamps = pd.to_datetime(values)
+    timestamps = timestamps.apply(lambda x: x.strftime("%Y-%m-%d"))
+    return pd.to_datetime(timestamps)
+
+def build_dataset(root, rows, assets):
+    rng = np.random.default_rng(0)
+    os.makedirs(os.path.join(root, "price"), exist_ok=True)
+    os.makedirs(os.path.join(root, "news"), exist_ok=True)
+
+    names = ["ASSET{}".format(index) for index in range(assets)]
+    with open(os.path.join(root, "assets.txt"), "w") as op:
+        op.write("\n".join(names))
+
+    days = pd.date_range("2015-01-01", "2023-12-31", freq="B")
+    for name in names:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        pd.DataFrame({
+            "timestamp": days.strftime("%Y-%m-%d"),
+            "open": close, "high": close, "low": close, "close": close, "adj_close": close,
+            "volume": rng.integers(1e5, 1e7, len(days)),
+        }).to_parquet(os.path.join(root, "price", "{}.parquet".format(name)), index=False)
+
+        n = rows // assets
+        seconds = rng.integers(0, int((days[-1] - days[0]).total_seconds()), n)
+        timestamps = days[0] + pd.to_timedelta(np.sort(seconds), unit="s")
+        pd.DataFrame({
+            "timestamp": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+            "type": "fmp",
+            "source": "source",
+            "title": "title",
+            "text": "text",
+        }).to_parquet(os.path.join(root, "news", "{}.parquet".format(name)), index=False)
+    return names
+
+def main():
+    args = parse_args()
+
+    root = args.workdir if args.workdir else tempfile.mkdtemp()
+    print(">" * 30 + "Building {} news rows for {} assets in {}".format(args.rows, args.assets, root) + ">" * 30)
+    names = build_dataset(root, args.rows, args.assets)
+
+    news = pd.concat([pd.read_parquet(os.path.join(root, "news", "{}.parquet".format(name))) for name in names])
+
+    start = time.time()
+    legacy = legacy_normalize_dates(news["timestamp"])
+    legacy_time = time.time() - start
+
+    start = time.time()
+    vectorized = normalize_dates(news["timestamp"])
+    vectorized_time = time.time() - start
+
+    assert (legacy.values == vectorized.values).all()
+    print("| normalize {} timestamps: per-row strftime {:.2f}s, vectorized {:.2f}s ({:.1f}x)".format(
+        len(news), legacy_time, vectorized_time, legacy_time / max(vectorized_time, 1e-9)))
+
+    start = time.time()
+    dataset = Dataset(root=root,
+                      price_path="price",
+                      news_path="news",
+                      assets_path="assets.txt",
+                      workdir="workdir",
+                      tag="benchmark",
+                      lazy=False)
+    print("| Dataset startup (eager): {:.2f}s, {} news rows".format(
+        time.time() - start, sum([len(df) for df in dataset.news.values()])))
+
+    start = time.time()
+    dataset = Dataset(root=root,
+                      price_path="price",
+                      news_path="news",
+                      assets_path="assets.txt",
+                      workdir="workdir",
+                      tag="benchmark")
+    news = dataset.news[names[0]]
+    print("| Dataset startup (lazy) and first access of one asset: {:.2f}s, {} news rows".format(
+        time.time() - start, len(news)))
+
+    for label in ["cold", "warm"]:
+        start = time.time()
+        dataset = Dataset(root=root,
+                          price_path="price",
+                          news_path="news",
+                          assets_path="assets.txt",
+                          workdir="workdir",
+                          tag="benchmark",
+                          lazy=False,
+                          snapshot_path="snapshot")
+        print("| Dataset startup (eager, {} snapshot): {:.2f}s, {} news rows".format(
+            label, time.time() - start, sum([len(df) for df in dataset.news.values()])))
+
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
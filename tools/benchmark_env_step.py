@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.data import Dataset
+from finagent.environment import EnvironmentTrading
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark EnvironmentTrading.step over a 10-year daily history with dense news")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--news_per_day", type=int, default=50)
+    parser.add_argument("--look_back_days", type=int, default=14)
+    parser.add_argument("--look_forward_days", type=int, default=14)
+    parser.add_argument("--workdir", type=str, default=None, help="where to write the synthetic dataset, default a temp dir")
+    args = parser.parse_args()
+    return args
+
+def build_dataset(root, years, news_per_day):
+    rng = np.random.default_rng(0)
+    for source in ["price", "news", "guidance", "sentiment"]:
+        os.makedirs(os.path.join(root, source), exist_ok=True)
+    with open(os.path.join(root, "assets.txt"), "w") as op:
+        op.write("ASSET")
+
+    days = pd.bdate_range("2014-01-01", periods=years * 252)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+    pd.DataFrame({
+        "timestamp": days,
+        "open": close, "high": close, "low": close, "close": close, "adj_close": close,
+        "volume": rng.integers(1e5, 1e7, len(days)),
+    }).to_parquet(os.path.join(root, "price", "ASSET.parquet"), index=False)
+
+    n = len(days) * news_per_day
+    pd.DataFrame({
+        "timestamp": np.repeat(days.values, news_per_day),
+        "type": "fmp",
+        "source": "source",
+        "title": ["title {}".format(index) for index in range(n)],
+        "text": "text",
+    }).to_parquet(os.path.join(root, "news", "ASSET.parquet"), index=False)
+
+    quarters = days[::63]
+    pd.DataFrame({
+        "timestamp": quarters,
+        "sentiment": rng.random(len(quarters)),
+        "title": "guidance",
+        "text": "guidance",
+    }).to_parquet(os.path.join(root, "guidance", "ASSET.parquet"), index=False)
+
+    pd.DataFrame({
+        "timestamp": days,
+        "stocktwits_posts": 1.0,
+        "stocktwits_comments": 1.0,
+        "stocktwits_likes": 1.0,
+        "stocktwits_impressions": 1.0,
+        "stocktwits_sentiment": rng.random(len(days)),
+    }).to_parquet(os.path.join(root, "sentiment", "ASSET.parquet"), index=False)
+
+    months = pd.date_range(days[0], days[-1], freq="MS")
+    pd.DataFrame({
+        "timestamp": months,
+        "gdp": 1.0, "cpi": 1.0, "unemployment_rate": 1.0, "federal_funds": 1.0, "inflation_rate": 1.0,
+    }).to_parquet(os.path.join(root, "economic.parquet"), index=False)
+    return days
+
+def mask_window(df, days_ago, days_future):
+    """get_state's previous per-frame slicing, two full boolean masks."""
+    if df is None:
+        return None
+    df = df[df.index <= days_future]
+    return df[df.index >= days_ago]
+
+def run(env, legacy = False):
+    if legacy:
+        env._window_slice = lambda name, df, days_ago, days_future: mask_window(df, days_ago, days_future)
+    env.reset()
+    steps = 0
+    start = time.time()
+    done = False
+    while not done:
+        _, _, done, _, _ = env.step(0)
+        steps += 1
+    return steps, time.time() - start
+
+def main():
+    args = parse_args()
+
+    root = args.workdir if args.workdir else tempfile.mkdtemp()
+    print(">" * 30 + "Building {} years with {} news per day in {}".format(args.years, args.news_per_day, root) + ">" * 30)
+    days = build_dataset(root, args.years, args.news_per_day)
+
+    dataset = Dataset(root=root,
+                      price_path="price",
+                      news_path="news",
+                      guidance_path="guidance",
+                      sentiment_path="sentiment",
+                      economics_path="economic.parquet",
+                      assets_path="assets.txt",
+                      workdir="workdir",
+                      tag="benchmark")
+
+    kwargs = dict(dataset=dataset,
+                  selected_asset="ASSET",
+                  start_date=days[args.look_back_days].strftime("%Y-%m-%d"),
+                  end_date=days[-1].strftime("%Y-%m-%d"),
+                  look_back_days=args.look_back_days,
+                  look_forward_days=args.look_forward_days)
+
+    steps, mask_time = run(EnvironmentTrading(**kwargs), legacy=True)
+    steps, search_time = run(EnvironmentTrading(**kwargs))
+    print("| env.step over {} days, {} news rows: boolean masks {:.2f}ms/step, searchsorted {:.2f}ms/step ({:.1f}x)".format(
+        steps, len(dataset.news["ASSET"]), 1000 * mask_time / steps, 1000 * search_time / steps, mask_time / max(search_time, 1e-9)))
+
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
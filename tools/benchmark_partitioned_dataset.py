@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.data import Dataset
+from finagent.data.partitioned import write_partitioned
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the per-file and the partitioned Dataset layouts")
+    parser.add_argument("--assets", type=int, default=20)
+    parser.add_argument("--news_per_day", type=int, default=30)
+    parser.add_argument("--start_date", type=str, default="2022-06-01", help="environment window")
+    parser.add_argument("--end_date", type=str, default="2023-01-01", help="environment window")
+    parser.add_argument("--workdir", type=str, default=None, help="where to write the synthetic dataset, default a temp dir")
+    args = parser.parse_args()
+    return args
+
+def build_dataset(root, assets, news_per_day):
+    rng = np.random.default_rng(0)
+    for source in ["price", "news"]:
+        os.makedirs(os.path.join(root, source), exist_ok=True)
+
+    names = ["ASSET{}".format(index) for index in range(assets)]
+    with open(os.path.join(root, "assets.txt"), "w") as op:
+        op.write("\n".join(names))
+
+    days = pd.bdate_range("2010-01-01", "2023-12-31")
+    for name in names:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        price_df = pd.DataFrame({
+            "timestamp": days,
+            "open": close, "high": close, "low": close, "close": close, "adj_close": close,
+            "volume": rng.integers(1e5, 1e7, len(days)),
+        })
+
+        n = len(days) * news_per_day
+        news_df = pd.DataFrame({
+            "timestamp": np.repeat(days.strftime("%Y-%m-%d").values, news_per_day),
+            "type": "fmp",
+            "source": "source",
+            "title": ["title {}".format(index) for index in range(n)],
+            "text": "text " * 50,
+            "url": "url",
+        })
+
+        price_df.to_parquet(os.path.join(root, "price", "{}.parquet".format(name)), index=False)
+        news_df.to_parquet(os.path.join(root, "news", "{}.parquet".format(name)), index=False)
+        write_partitioned(os.path.join(root, "dataset"), "price", name, price_df)
+        write_partitioned(os.path.join(root, "dataset"), "news", name, news_df)
+    return names
+
+def load(root, names, **kwargs):
+    start = time.time()
+    dataset = Dataset(root=root,
+                      price_path="price",
+                      news_path="news",
+                      assets_path="assets.txt",
+                      workdir="workdir",
+                      tag="benchmark",
+                      **kwargs)
+    rows = 0
+    for name in names:
+        rows += len(dataset.prices[name]) + len(dataset.news[name])
+    return dataset, time.time() - start, rows
+
+def main():
+    args = parse_args()
+
+    root = args.workdir if args.workdir else tempfile.mkdtemp()
+    print(">" * 30 + "Building {} assets in {}".format(args.assets, root) + ">" * 30)
+    names = build_dataset(root, args.assets, args.news_per_day)
+
+    window = dict(start_date=args.start_date, end_date=args.end_date, look_back_days=14, look_forward_days=14)
+
+    for label, selected in [("one asset", names[:1]), ("all assets", names)]:
+        per_file, per_file_time, per_file_rows = load(root, selected)
+        partitioned, partitioned_time, partitioned_rows = load(root, selected, partitioned_path="dataset", **window)
+        print("| {}: per-file {:.2f}s ({} rows), partitioned window {:.2f}s ({} rows), {:.1f}x".format(
+            label, per_file_time, per_file_rows, partitioned_time, partitioned_rows,
+            per_file_time / max(partitioned_time, 1e-9)))
+
+    # the window holds the same rows as the per-file tables
+    start, end = partitioned._window()
+    for name in names[:1]:
+        expected = per_file.prices[name]
+        expected = expected[(expected["timestamp"] >= start) & (expected["timestamp"] <= end)].reset_index(drop=True)
+        assert expected.equals(partitioned.prices[name])
+
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
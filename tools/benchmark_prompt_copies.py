@@ -0,0 +1,128 @@
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.data import Dataset
+from finagent.environment import EnvironmentTrading
+from finagent.prompt.context import StateContext, ParamsContext
+from tools.benchmark_env_step import build_dataset
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the bytes copied per run_step by the state and params passing of the prompt stages")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--news_per_day", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--records", type=int, default=250, help="trading records in the params of the high level reflection")
+    parser.add_argument("--workdir", type=str, default=None, help="where to write the synthetic dataset, default a temp dir")
+    args = parser.parse_args()
+    return args
+
+# (stage, state frames the stage reads, whether it copies the params), in the order of run_step
+STAGES = [
+    ("prepared_tools_params", ["price", "news", "guidance", "sentiment", "economic"], True),
+    ("latest_market_intelligence.convert_to_params", ["price", "news"], True),
+    ("prepare_latest_market_intelligence_params", [], True),
+    ("latest_market_intelligence.add_to_memory", ["price", "news"], False),
+    ("past_market_intelligence.convert_to_params", [], True),
+    ("low_level_reflection.convert_to_params", ["price"], True),
+    ("prepare_low_level_reflection_params", [], True),
+    ("low_level_reflection.add_to_memory", [], True),
+    ("high_level_reflection.convert_to_params", [], True),
+    ("prepare_high_level_reflection_params", [], True),
+    ("high_level_reflection.add_to_memory", [], True),
+    ("decision.convert_to_params", [], True),
+]
+
+def deepcopy_step(state, params):
+    """The state and params passing of run_step before the contexts, a deepcopy per read."""
+    kept = []
+    for name, frames, copies_params in STAGES:
+        for frame in frames:
+            kept.append(deepcopy(state[frame]))
+        if copies_params:
+            res_params = deepcopy(params)
+            res_params.update({name: "stage output"})
+            kept.append(res_params)
+    return kept
+
+def context_step(state, params):
+    """The same reads through StateContext and ParamsContext."""
+    kept = []
+    state = StateContext(state)
+    for name, frames, copies_params in STAGES:
+        for frame in frames:
+            kept.append(state[frame])
+        if copies_params:
+            res_params = ParamsContext(params)
+            res_params.update({name: "stage output"})
+            kept.append(res_params)
+    return kept
+
+def measure(step, env, params, steps):
+    """Bytes allocated per step while the stage outputs are alive, and seconds per step."""
+    env.reset()
+    allocated = 0
+    seconds = 0
+    for _ in range(steps):
+        state, _, _, _, _ = env.step(0)
+        tracemalloc.start()
+        start = time.time()
+        kept = step(state, params)
+        seconds += time.time() - start
+        allocated += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del kept
+    return allocated / steps, seconds / steps
+
+def main():
+    args = parse_args()
+
+    root = args.workdir if args.workdir else tempfile.mkdtemp()
+    print(">" * 30 + "Building {} years with {} news per day in {}".format(args.years, args.news_per_day, root) + ">" * 30)
+    days = build_dataset(root, args.years, args.news_per_day)
+
+    dataset = Dataset(root=root,
+                      price_path="price",
+                      news_path="news",
+                      guidance_path="guidance",
+                      sentiment_path="sentiment",
+                      economics_path="economic.parquet",
+                      assets_path="assets.txt",
+                      workdir="workdir",
+                      tag="benchmark")
+    env = EnvironmentTrading(dataset=dataset,
+                             selected_asset="ASSET",
+                             start_date=days[30].strftime("%Y-%m-%d"),
+                             end_date=days[-30].strftime("%Y-%m-%d"))
+
+    # params of the size run_step builds: prompt texts, the memory query results and the trading records
+    params = {
+        "kline_path": "kline.png",
+        "latest_market_intelligence": "headline and content\n" * 200,
+        "past_market_intelligence": "headline and content\n" * 200,
+        "latest_market_intelligence_query": {"short_term_query": "query " * 20, "medium_term_query": "query " * 20},
+        "low_level_reflection_reasoning": {"short_term_reasoning": "reasoning " * 50, "medium_term_reasoning": "reasoning " * 50},
+        "previous_date": ["2020-01-01"] * args.records,
+        "previous_action": ["HOLD"] * args.records,
+        "previous_reasoning": ["reasoning " * 50] * args.records,
+        "trader_preference": {"name": "trader", "text": "preference " * 100},
+    }
+
+    deepcopy_bytes, deepcopy_time = measure(deepcopy_step, env, params, args.steps)
+    context_bytes, context_time = measure(context_step, env, params, args.steps)
+    print("| state and params passing per run_step: deepcopy {:.1f}KB ({:.2f}ms), contexts {:.1f}KB ({:.2f}ms), {:.0f}x fewer bytes".format(
+        deepcopy_bytes / 1024, 1000 * deepcopy_time, context_bytes / 1024, 1000 * context_time, deepcopy_bytes / max(context_bytes, 1)))
+
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.processor.processor import Processor
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that Processor(incremental=True) matches a full recompute after appended and revised bars")
+    parser.add_argument("--days", type=int, default=600)
+    parser.add_argument("--append", type=int, default=20, help="bars appended between the runs")
+    parser.add_argument("--tolerance", type=float, default=1e-8, help="relative tolerance of the appended rows")
+    parser.add_argument("--workdir", type=str, default=None, help="where to write the synthetic data, default a temp dir")
+    args = parser.parse_args()
+    return args
+
+def write_prices(root, df):
+    df.to_csv(os.path.join(root, "raw", "prices", "ASSET.csv"), index=False)
+
+def build_prices(days):
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    return pd.DataFrame({
+        "timestamp": pd.bdate_range("2015-01-01", periods=days).strftime("%Y-%m-%d"),
+        "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.integers(1e5, 1e7, days), "adjClose": close,
+    })
+
+def features(root, incremental):
+    tag = "incremental" if incremental else "full"
+    processor = Processor(root=root,
+                          path_params={"prices": [{"type": "fmp", "path": "raw/prices"}]},
+                          stocks_path="assets.txt",
+                          start_date="2010-01-01",
+                          end_date="2030-01-01",
+                          workdir="workdir",
+                          tag=tag,
+                          incremental=incremental,
+                          use_manifest=False)
+    processor.process()
+    return pd.read_parquet(os.path.join(root, "workdir", tag, "features", "ASSET.parquet"))
+
+def compare(name, root, tolerance):
+    incremental = features(root, incremental=True)
+    full = features(root, incremental=False)
+    assert list(incremental.columns) == list(full.columns) and len(incremental) == len(full), name
+    assert (incremental["timestamp"].values == full["timestamp"].values).all(), name
+    incremental = incremental.drop(columns=["timestamp"]).values.astype(np.float64)
+    full = full.drop(columns=["timestamp"]).values.astype(np.float64)
+    error = np.nanmax(np.abs(incremental - full) / (np.abs(full) + 1.0))
+    assert np.array_equal(np.isnan(incremental), np.isnan(full)) and error <= tolerance, \
+        "{}: incremental features differ from a full recompute by {:.3g}".format(name, error)
+    print("| {}: {} rows, max relative difference {:.3g}".format(name, len(full), error))
+
+def main():
+    args = parse_args()
+
+    root = args.workdir if args.workdir else tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "raw", "prices"), exist_ok=True)
+    with open(os.path.join(root, "assets.txt"), "w") as op:
+        op.write("ASSET")
+
+    prices = build_prices(args.days)
+    print(">" * 30 + "Checking incremental features in {}".format(root) + ">" * 30)
+
+    write_prices(root, prices.iloc[:args.days - 2 * args.append])
+    compare("initial", root, args.tolerance)
+
+    write_prices(root, prices.iloc[:args.days - args.append])
+    compare("appended bars", root, args.tolerance)
+
+    revised = prices.copy()
+    revised.loc[args.days // 2, ["close", "adjClose"]] *= 1.5
+    revised.loc[args.days - args.append - 1, "volume"] += 1
+    write_prices(root, revised)
+    compare("revised history", root, args.tolerance)
+
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
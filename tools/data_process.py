@@ -6,7 +6,6 @@ warnings.filterwarnings("ignore")
 import os
 import sys
 from pathlib import Path
-import multiprocessing
 import argparse
 from mmengine.config import Config, DictAction
 
@@ -31,20 +30,13 @@ def parse_args():
         'is allowed.')
     parser.add_argument("--root", type=str, default=ROOT)
     parser.add_argument("--workdir", type=str, default="workdir")
-    parser.add_argument("--batch_size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, default cpu_count")
+    parser.add_argument("--if_resume", type=int, default=1, help="skip stocks whose outputs are up to date")
     parser.add_argument("--tag", type=str, default=None)
     parser.add_argument("--if_remove", action="store_true", default=False)
     args = parser.parse_args()
     return args
 
-class StockProcessorProcess(multiprocessing.Process):
-    def __init__(self, stocks, processor):
-        super().__init__()
-        self.stocks = stocks
-        self.processor = processor
-    def run(self):
-        self.processor.process(self.stocks)
-
 def main():
     args = parse_args()
 
@@ -58,8 +50,8 @@ def main():
         args.cfg_options["workdir"] = args.workdir
     if args.tag is not None:
         args.cfg_options["tag"] = args.tag
-    if args.batch_size is not None:
-        args.cfg_options["batch_size"] = args.batch_size
+    if args.workers is not None:
+        args.cfg_options["workers"] = args.workers
     cfg.merge_from_dict(args.cfg_options)
 
     update_data_root(cfg, root=args.root)
@@ -78,22 +70,9 @@ def main():
     processor = PROCESSOR.build(cfg.processor)
     stocks = processor.stocks
 
-    batch_size = cfg.batch_size if cfg.batch_size < len(stocks) else 5
-    batch_size = min(len(stocks), batch_size)
-
-    processes = []
-    remaining_stocks = stocks.copy()
-
-    while remaining_stocks:
-        batch = remaining_stocks[:batch_size]
-        remaining_stocks = remaining_stocks[batch_size:]
-
-        process = StockProcessorProcess(batch, processor)
-        processes.append(process)
-        process.start()
+    workers = cfg.get("workers", None)
 
-    for process in processes:
-        process.join()
+    processor.process_parallel(stocks, workers=workers, resume=bool(args.if_resume))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -18,9 +18,12 @@ sys.path.append(ROOT)
 from finagent.registry import DATASET, ENVIRONMENT, PROVIDER, PROMPT, MEMORY, PLOTS
 from finagent.asset import ASSET
 from finagent.utils.misc import update_data_root
-from finagent.utils import read_resource_file, save_json, load_json
+from finagent.utils import read_resource_file, save_json, load_json, TradingRecordStore
 from finagent.query import DiverseQuery
-from finagent.prompt import (prepare_latest_market_intelligence_params,
+from finagent.prompt import (StateContext,
+                             ParamsContext,
+                             additions,
+                             prepare_latest_market_intelligence_params,
                              prepare_low_level_reflection_params,
                              prepare_high_level_reflection_params,
                              prepared_tools_params)
@@ -158,7 +161,11 @@ def run(cfg, env, plots, memory, provider, diverse_query, strategy_agents,  exp_
     if cfg.if_load_trading_record and cfg.trading_record_path is not None:
         print("load trading records...")
         record_path = os.path.join(cfg.root, cfg.trading_record_path)
-        trading_records = load_json(record_path)
+        if os.path.isdir(record_path):
+            # a trading record log, e.g. workdir/tag/trading_records/train
+            trading_records = TradingRecordStore(record_path).to_dict()
+        else:
+            trading_records = load_json(record_path)
     else:
         trading_records = {
             "symbol": [],
@@ -176,17 +183,33 @@ def run(cfg, env, plots, memory, provider, diverse_query, strategy_agents,  exp_
             "total_return": [],
             "action": [],
             "reasoning": [],
+            "snapshot": [],
         }
 
     state, info = env.reset()
 
     if cfg.checkpoint_start_date is not None:
-        for action, date in zip(trading_records["action"], trading_records["date"]):
-            if date <= cfg.checkpoint_start_date:
-                action = env.action_map[action]
-                state, reward, done, truncated, info = env.step(action)
-            else:
-                break
+        # jump to the checkpoint with the env snapshot saved after the step of its date,
+        # records saved without snapshots replay their actions
+        replay_dates = [date for action, date in zip(trading_records["action"], trading_records["date"])
+                        if date <= cfg.checkpoint_start_date]
+        snapshots = trading_records.get("snapshot", [])
+        if len(replay_dates) > 0 and len(snapshots) >= len(replay_dates):
+            state, info = env.restore(snapshots[len(replay_dates) - 1])
+        else:
+            trading_records["snapshot"] = []
+            for action, date in zip(trading_records["action"], trading_records["date"]):
+                if date <= cfg.checkpoint_start_date:
+                    action = env.action_map[action]
+                    state, reward, done, truncated, info = env.step(action)
+                    trading_records["snapshot"].append(env.get_snapshot())
+                else:
+                    break
+
+    # append-only log of the records, checkpointed after every step
+    trading_records.setdefault("snapshot", [])
+    record_store = TradingRecordStore(os.path.join(trading_records_path, mode))
+    record_store.reset(trading_records)
             
     # class로 선언
 
@@ -218,25 +241,32 @@ def run(cfg, env, plots, memory, provider, diverse_query, strategy_agents,  exp_
 
         if trading_records["action"][-1] != info["action"]:
             trading_records["action"][-1] = info["action"]
+        trading_records["snapshot"].append(env.get_snapshot())
 
         if done:
             trading_records["total_profit"].append(info["total_profit"])
             trading_records["total_return"].append(info["total_return"])
             trading_records["date"].append(info["date"])
             trading_records["price"].append(info["price"])
+            record_store.checkpoint(trading_records)
             break
 
         memory_save_path = os.path.join(memory_path, f"memory_{str(info['date'])}")
         os.makedirs(memory_save_path, exist_ok=True)
         memory.save_local(memory_path=memory_save_path)
 
-        save_json(trading_records, os.path.join(trading_records_path, f"trading_records_{str(info['date'])}.json"))
+        record_store.checkpoint(trading_records)
+
+    record_store.close()
 
     return trading_records
 
 def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_agents, exp_path, trading_records, mode):
 
-    params = dict()
+    # the stages read the state and params without copying them, each stage adds its params to a copy-on-write context
+    # and only its additions are handed back to the params of the step
+    state = StateContext(state)
+    params = ParamsContext()
     save_dir = "train" if mode == "train" else "valid"
 
     # plot kline
@@ -255,7 +285,7 @@ def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_
                                          strategy_agents=strategy_agents,
                                          cfg=cfg,
                                          mode=mode)
-    params.update(tools_params)
+    params.update(additions(tools_params))
 
     # latest market intelligence
     latest_market_intelligence_summary_template = read_resource_file(cfg.train_latest_market_intelligence_summary_template_path
@@ -282,7 +312,7 @@ def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_
                                                                                         memory=memory,
                                                                                         provider=provider,
                                                                                         diverse_query=diverse_query)
-    params.update(prepared_latest_market_intelligence_params)
+    params.update(additions(prepared_latest_market_intelligence_params))
 
     # add latest market intelligence to memory
     latest_market_intelligence_summary.add_to_memory(state=state,
@@ -326,7 +356,7 @@ def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_
                                                                               memory=memory,
                                                                               provider=provider,
                                                                               diverse_query=diverse_query)
-    params.update(prepared_low_level_reflection_params)
+    params.update(additions(prepared_low_level_reflection_params))
 
     # add low level reflection to memory
     low_level_reflection.add_to_memory(state=state,
@@ -349,9 +379,9 @@ def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_
     previous_action = trading_records["action"]
     previous_reasoning = trading_records["reasoning"]
     params.update({
-        "previous_date": previous_date,
-        "previous_action": previous_action,
-        "previous_reasoning": previous_reasoning,
+        "previous_date": list(previous_date),
+        "previous_action": list(previous_action),
+        "previous_reasoning": list(previous_reasoning),
     })
     high_level_reflection_template = read_resource_file(cfg.train_high_level_reflection_template_path
                                                         if mode == "train" else cfg.valid_high_level_reflection_template_path)
@@ -373,7 +403,7 @@ def run_step(cfg, state, info, plots, memory, provider, diverse_query, strategy_
                                                                                  memory=memory,
                                                                                  provider=provider,
                                                                                  diverse_query=diverse_query)
-    params.update(prepared_high_level_reflection_params)
+    params.update(additions(prepared_high_level_reflection_params))
 
     # add high level reflection to memory
     high_level_reflection.add_to_memory(state=state,
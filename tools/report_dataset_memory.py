@@ -0,0 +1,104 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path.append(ROOT)
+
+from finagent.data import Dataset
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report the memory of a full universe Dataset load with and without compact dtypes")
+    parser.add_argument("--root", type=str, default=None, help="processed dataset root, default a synthetic dataset")
+    parser.add_argument("--price_path", type=str, default="price")
+    parser.add_argument("--news_path", type=str, default="news")
+    parser.add_argument("--guidance_path", type=str, default=None)
+    parser.add_argument("--assets_path", type=str, default="assets.txt")
+    parser.add_argument("--rows", type=int, default=500000, help="news rows of the synthetic dataset")
+    parser.add_argument("--assets", type=int, default=10, help="assets of the synthetic dataset")
+    args = parser.parse_args()
+    return args
+
+def build_dataset(root, rows, assets):
+    rng = np.random.default_rng(0)
+    os.makedirs(os.path.join(root, "price"), exist_ok=True)
+    os.makedirs(os.path.join(root, "news"), exist_ok=True)
+
+    names = ["ASSET{}".format(index) for index in range(assets)]
+    with open(os.path.join(root, "assets.txt"), "w") as op:
+        op.write("\n".join(names))
+
+    days = pd.bdate_range("2015-01-01", "2023-12-31")
+    words = np.array(["market", "shares", "earnings", "growth", "revenue", "quarter", "analyst", "guidance", "stock", "price"])
+    for name in names:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        pd.DataFrame({
+            "timestamp": days,
+            "open": close, "high": close, "low": close, "close": close, "adj_close": close,
+            "volume": rng.integers(1e5, 1e7, len(days)),
+        }).to_parquet(os.path.join(root, "price", "{}.parquet".format(name)), index=False)
+
+        n = rows // assets
+        pd.DataFrame({
+            "timestamp": np.sort(rng.choice(days, n)),
+            "type": rng.choice(["fmp", "polygon", "yahoofinance"], n),
+            "source": rng.choice(["Reuters", "Benzinga", "Motley Fool", "Zacks"], n),
+            "title": [" ".join(rng.choice(words, 8)) for _ in range(n)],
+            "text": [" ".join(rng.choice(words, 60)) for _ in range(n)],
+        }).to_parquet(os.path.join(root, "news", "{}.parquet".format(name)), index=False)
+
+def frame_bytes(frames):
+    """Total bytes and bytes per column of a {asset: frame} mapping."""
+    columns = {}
+    for df in frames.values():
+        for column, nbytes in df.memory_usage(deep=True, index=False).items():
+            columns[column] = columns.get(column, 0) + nbytes
+    return sum(columns.values()), columns
+
+def report(name, frames, compact_frames):
+    rows = sum([len(df) for df in frames.values()])
+    if rows == 0:
+        return
+    total, columns = frame_bytes(frames)
+    compact_total, compact_columns = frame_bytes(compact_frames)
+    print("| {}: {} rows, {:.1f} -> {:.1f} bytes per row ({:.1f}x), {:.1f}MB -> {:.1f}MB".format(
+        name, rows, total / rows, compact_total / rows, total / max(compact_total, 1), total / 2 ** 20, compact_total / 2 ** 20))
+    for column in columns:
+        print("|     {:<10} {:>8.1f} -> {:>8.1f} bytes per row".format(column, columns[column] / rows, compact_columns[column] / rows))
+
+def main():
+    args = parse_args()
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp()
+        print(">" * 30 + "Building {} news rows for {} assets in {}".format(args.rows, args.assets, root) + ">" * 30)
+        build_dataset(root, args.rows, args.assets)
+
+    datasets = {}
+    for compact in [False, True]:
+        datasets[compact] = Dataset(root=root,
+                                    price_path=args.price_path,
+                                    news_path=args.news_path,
+                                    guidance_path=args.guidance_path,
+                                    assets_path=args.assets_path,
+                                    workdir="workdir",
+                                    tag="memory",
+                                    lazy=False,
+                                    compact=compact)
+
+    print(">" * 30 + "Dataset memory, object dtypes -> compact dtypes" + ">" * 30)
+    report("news", datasets[False].news, datasets[True].news)
+    if args.guidance_path is not None:
+        report("guidance", datasets[False].guidances, datasets[True].guidances)
+
+    if args.root is None:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()